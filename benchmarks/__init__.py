@@ -0,0 +1,6 @@
+"""
+.. module:: benchmarks
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Performance scenarios of mysql_executor.
+"""
@@ -0,0 +1,120 @@
+"""
+.. module:: benchmarks.__main__
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Runs the benchmark suites, prints their results as JSON and compares them
+with a baseline saved by a previous run. Example:
+
+    $ python -m benchmarks --save baseline.json
+    $ ... change AsyncConnectionPool ...
+    $ python -m benchmarks --baseline baseline.json --threshold 0.1
+
+The exit status is 1 when a result is worse than its baseline by more than
+the threshold. Results are rates (higher is better) except times ending
+with ``_us`` and ``modules_loaded`` (lower is better).
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+
+from . import (bench_converters, bench_decode, bench_hot_paths, bench_import,
+               bench_pool)
+
+SUITES = {
+    'converters': bench_converters.run,
+    'decode': bench_decode.run,
+    'hot_paths': bench_hot_paths.run,
+    'import': bench_import.run,
+    'pool': bench_pool.run,
+}
+
+#: suffixes of results for which lower values are better
+LOWER_IS_BETTER = ('_us', 'modules_loaded')
+
+
+def run(suites, repeat=1):
+    """Runs `suites` `repeat` times and returns medians of their results
+    named ``<suite>.<result>``
+
+    :rtype: dict
+    """
+    samples = {}
+    for name in suites:
+        for _ in range(repeat):
+            for key, value in SUITES[name]().items():
+                samples.setdefault('%s.%s' % (name, key), []).append(value)
+    return {key: statistics.median(values)
+            for key, values in samples.items()}
+
+
+def compare(results, baseline, threshold):
+    """Compares `results` with `baseline`
+
+    :param float threshold: relative change considered a regression
+    :return: list of ``(name, baseline, result, change, regressed)``,
+        `change` is positive when the result is better
+    """
+    rows = []
+    for name in sorted(results):
+        if name not in baseline or not baseline[name]:
+            continue
+        change = (results[name] - baseline[name]) / abs(baseline[name])
+        if name.endswith(LOWER_IS_BETTER):
+            change = -change
+        rows.append((name, baseline[name], results[name], change,
+                     change < -threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Runs benchmarks of mysql_executor.'
+    )
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES),
+                        help='suite to run, all by default, repeatable')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per suite, the median is reported')
+    parser.add_argument('--output', help='file to write results to')
+    parser.add_argument('--save', metavar='BASELINE',
+                        help='file to save results to as a baseline')
+    parser.add_argument('--baseline', help='baseline file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    document = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': run(args.suite or sorted(SUITES), args.repeat),
+    }
+    text = json.dumps(document, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fileobj:
+            fileobj.write(text + '\n')
+    else:
+        print(text)
+    if args.save:
+        with open(args.save, 'w') as fileobj:
+            fileobj.write(text + '\n')
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as fileobj:
+        baseline = json.load(fileobj)['results']
+    regressions = 0
+    for name, before, after, change, regressed in compare(
+            document['results'], baseline, args.threshold):
+        regressions += regressed
+        print('%-60s %14.2f %14.2f %+8.1f%%%s' % (
+            name, before, after, change * 100,
+            '  REGRESSION' if regressed else ''
+        ), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+.. module:: bench_converters
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Compares conversion of raw rows by :meth:`MySQLConverter.row_to_python`,
+which looks up the converter of every value, with decoders built once
+per result set by :func:`mysql_executor.conversion.column_decoders`.
+
+Run: python -m benchmarks.bench_converters --rows 200000
+"""
+
+import argparse
+from time import perf_counter
+
+from mysql.connector.conversion import MySQLConverter
+
+from mysql_executor.conversion import column_decoders, apply_decoders
+from .bench_decode import DESCRIPTION, make_rows
+
+
+def bench_row_to_python(rows):
+    row_to_python = MySQLConverter('utf8', True).row_to_python
+    start = perf_counter()
+    [row_to_python(row, DESCRIPTION) for row in rows]
+    return perf_counter() - start
+
+
+def bench_column_decoders(rows):
+    start = perf_counter()
+    apply_decoders(rows, column_decoders(DESCRIPTION))
+    return perf_counter() - start
+
+
+def run(rows=200000):
+    data = make_rows(rows)
+    row_to_python = bench_row_to_python(data)
+    decoders = bench_column_decoders(data)
+    return {
+        'row_to_python_rows_per_sec': rows / row_to_python,
+        'column_decoders_rows_per_sec': rows / decoders,
+        'speedup': row_to_python / decoders,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    for name, value in sorted(run(args.rows).items()):
+        print('%-32s %12.2f' % (name, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+.. module:: bench_decode
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Compares conversion of raw rows in the calling thread with conversion
+in a process pool, as done by ``async_cursor(decode_executor=...)``.
+
+Run: python -m benchmarks.bench_decode --rows 200000 --workers 4
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from time import perf_counter
+
+from mysql.connector.constants import FieldType
+
+from mysql_executor.conversion import decode_rows
+
+DESCRIPTION = [
+    ('id', FieldType.LONGLONG, None, None, None, None, 0, 0),
+    ('amount', FieldType.NEWDECIMAL, None, None, None, None, 1, 0),
+    ('created', FieldType.DATETIME, None, None, None, None, 1, 0),
+    ('payload', FieldType.VAR_STRING, None, None, None, None, 1, 0),
+]
+
+
+def make_rows(count):
+    return [
+        (str(i).encode(),
+         ('%d.%02d' % (i, i % 100)).encode(),
+         b'2015-01-02 03:04:05.123456',
+         ('{"id": %d, "tags": ["a", "b"], "note": "row %d"}' % (i, i))
+         .encode())
+        for i in range(count)
+    ]
+
+
+def bench_in_thread(rows):
+    start = perf_counter()
+    decode_rows(rows, DESCRIPTION)
+    return perf_counter() - start
+
+
+def bench_process_pool(rows, workers, chunk_size):
+    loop = asyncio.new_event_loop()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    decode = partial(decode_rows, description=DESCRIPTION)
+    try:
+        # start worker processes before measuring
+        loop.run_until_complete(asyncio.gather(
+            *[loop.run_in_executor(executor, decode, rows[:1])
+              for _ in range(workers)],
+            loop=loop
+        ))
+
+        start = perf_counter()
+        loop.run_until_complete(asyncio.gather(
+            *[loop.run_in_executor(executor, decode, rows[i:i + chunk_size])
+              for i in range(0, len(rows), chunk_size)],
+            loop=loop
+        ))
+        return perf_counter() - start
+    finally:
+        executor.shutdown()
+        loop.close()
+
+
+def run(rows=200000, workers=4, chunk_size=1000):
+    data = make_rows(rows)
+    in_thread = bench_in_thread(data)
+    process_pool = bench_process_pool(data, workers, chunk_size)
+    return {
+        'rows': rows,
+        'in_thread_rows_per_sec': rows / in_thread,
+        'process_pool_rows_per_sec': rows / process_pool,
+        'speedup': in_thread / process_pool,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    for name, value in sorted(run(args.rows, args.workers,
+                                  args.chunk_size).items()):
+        print('%-28s %12.2f' % (name, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+.. module:: bench_hot_paths
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Hot paths of the pool, the cursor and the executors measured against
+:class:`tests.fake_server.FakeMySQLServer`, no MySQL server is needed.
+
+Run: python -m benchmarks.bench_hot_paths
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from mysql.connector.constants import FieldType
+
+from mysql_executor import AsyncConnectionPool
+from tests.fake_server import FakeMySQLServer
+
+ROWS_QUERY = 'SELECT id, name, amount FROM rows'
+
+
+def make_server(rows=10000, latency=0.0):
+    server = FakeMySQLServer()
+    server.add_result(
+        ROWS_QUERY,
+        [('id', FieldType.LONGLONG), 'name',
+         ('amount', FieldType.NEWDECIMAL)],
+        lambda: ((i, 'name%d' % i, '%d.50' % i) for i in range(rows))
+    )
+    server.add_result(r'SELECT SLEEP\(0\)', [('sleep', FieldType.LONGLONG)],
+                      [(0,)], latency=latency)
+    return server
+
+
+@asyncio.coroutine
+def checkouts(pool, workers, count, loop, hold=False):
+    """Checkouts per second of `workers` tasks getting and releasing
+    connections `count` times each
+
+    :param bool hold: hold every connection for one loop iteration
+    """
+    @asyncio.coroutine
+    def worker():
+        for _ in range(count):
+            cnx = yield from pool.get()
+            if hold:
+                yield from asyncio.sleep(0, loop=loop)
+            pool.release(cnx)
+
+    # connections are opened before measuring
+    opened = []
+    for _ in range(pool.size):
+        opened.append((yield from pool.get()))
+    for cnx in opened:
+        pool.release(cnx)
+
+    start = perf_counter()
+    yield from asyncio.gather(*[worker() for _ in range(workers)], loop=loop)
+    return workers * count / (perf_counter() - start)
+
+
+@asyncio.coroutine
+def fetch_rows(cnx, mode, size=100):
+    """Rows per second of draining the scripted result with `mode`"""
+    cursor = yield from cnx.async_cursor()
+    start = perf_counter()
+    yield from cursor.execute(ROWS_QUERY)
+    count = 0
+    if mode == 'fetchone':
+        while (yield from cursor.fetchone()) is not None:
+            count += 1
+    elif mode == 'fetchmany':
+        while True:
+            rows = yield from cursor.fetchmany(size)
+            if not rows:
+                break
+            count += len(rows)
+    else:
+        count = len((yield from cursor.fetchall()))
+    return count / (perf_counter() - start)
+
+
+@asyncio.coroutine
+def executor_overhead(cnx, count):
+    """Microseconds added by a round trip through the connection's
+    executor compared to a direct call
+    """
+    def noop():
+        pass
+
+    start = perf_counter()
+    for _ in range(count):
+        noop()
+    direct = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(count):
+        yield from cnx._run_in_executor(noop)
+    return (perf_counter() - start - direct) / count * 1e6
+
+
+@asyncio.coroutine
+def concurrency(server, sizes, queries, loop):
+    """Queries per second of `size` concurrent connections running
+    a query with the scripted latency, for each of `sizes`
+    """
+    result = {}
+    for size in sizes:
+        pool = AsyncConnectionPool(size=size, loop=loop, **server.config)
+
+        @asyncio.coroutine
+        def worker():
+            with (yield from pool) as cnx:
+                cursor = yield from cnx.async_cursor()
+                for _ in range(queries):
+                    yield from cursor.execute('SELECT SLEEP(0)')
+                    yield from cursor.fetchall()
+
+        start = perf_counter()
+        yield from asyncio.gather(*[worker() for _ in range(size)],
+                                  loop=loop)
+        result[size] = size * queries / (perf_counter() - start)
+        yield from pool.shutdown()
+    return result
+
+
+def run(rows=10000, checkout_count=2000, latency=0.001,
+        sizes=(1, 2, 4, 8, 16)):
+    """Runs all scenarios and returns their results
+
+    :rtype: dict
+    """
+    server = make_server(rows, latency)
+    loop = asyncio.new_event_loop()
+    results = {}
+
+    @asyncio.coroutine
+    def scenarios():
+        pool = AsyncConnectionPool(size=4, loop=loop, **server.config)
+        results['checkouts_per_sec'] = yield from checkouts(
+            pool, 16, checkout_count, loop)
+
+        with (yield from pool) as cnx:
+            for mode in ('fetchone', 'fetchmany', 'fetchall'):
+                results[mode + '_rows_per_sec'] = \
+                    yield from fetch_rows(cnx, mode)
+            results['executor_overhead_us'] = \
+                yield from executor_overhead(cnx, 2000)
+        yield from pool.shutdown()
+
+        pool = AsyncConnectionPool(size=1, loop=loop, compress=True,
+                                   **server.config)
+        with (yield from pool) as cnx:
+            results['fetchall_compressed_rows_per_sec'] = \
+                yield from fetch_rows(cnx, 'fetchall')
+        stats = pool.stats
+        results['compressed_bytes_saved_ratio'] = \
+            stats['bytes_saved'] / stats['payload_received']
+        yield from pool.shutdown()
+
+        for size, qps in (yield from concurrency(server, sizes, 50,
+                                                  loop)).items():
+            results['queries_per_sec_%d_connections' % size] = qps
+
+    with server:
+        try:
+            loop.run_until_complete(scenarios())
+        finally:
+            loop.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.001,
+                        help='seconds of scripted query latency')
+    args = parser.parse_args()
+
+    for name, value in sorted(run(args.rows, latency=args.latency).items()):
+        print('%-36s %12.2f' % (name, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+.. module:: bench_import
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Cold start costs measured in fresh interpreters: importing the package,
+then getting :class:`AsyncConnectionPool` and creating a pool, which
+imports mysql.connector, and ``from mysql_executor import *``.
+
+Run: python -m benchmarks.bench_import --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SCRIPT = '''
+import json, sys
+from time import perf_counter
+start = perf_counter()
+import mysql_executor
+imported = perf_counter()
+pool = mysql_executor.AsyncConnectionPool(size=1)
+created = perf_counter()
+print(json.dumps([imported - start, created - imported,
+                  len(sys.modules)]))
+'''
+
+STAR_SCRIPT = '''
+import json
+from time import perf_counter
+start = perf_counter()
+from mysql_executor import *
+print(json.dumps(perf_counter() - start))
+'''
+
+
+def measure(script=SCRIPT):
+    """Returns the output of `script` run in a fresh interpreter, by
+    default seconds of the import, seconds of creating a pool and the
+    number of loaded modules
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', script],
+                                     cwd=root)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def run(runs=10):
+    samples = [measure() for _ in range(runs)]
+    star = [measure(STAR_SCRIPT) for _ in range(runs)]
+    return {
+        'import_us': statistics.median(s[0] for s in samples) * 1e6,
+        'first_pool_us': statistics.median(s[1] for s in samples) * 1e6,
+        'modules_loaded': samples[-1][2],
+        'star_import_us': statistics.median(star) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--runs', type=int, default=10,
+                        help='fresh interpreters to start')
+    args = parser.parse_args()
+
+    for name, value in sorted(run(args.runs).items()):
+        print('%-20s %12.2f' % (name, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+.. module:: bench_pool
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Pool contention, executemany batches, single-row inserts with and without
+a write-behind queue and connect storms measured against
+:class:`tests.fake_server.FakeMySQLServer`, no MySQL server is needed.
+
+Run: python -m benchmarks.bench_pool
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from mysql_executor import AsyncConnectionPool
+from tests.fake_server import FakeMySQLServer
+
+from .bench_hot_paths import checkouts
+
+
+@asyncio.coroutine
+def contention(config, size, waiters, count, loop):
+    """Checkouts per second of `waiters` tasks sharing a pool of `size`
+    connections, each holding a connection for one loop iteration
+    """
+    pool = AsyncConnectionPool(size=size, queue_timeout=60.0, loop=loop,
+                               **config)
+    try:
+        return (yield from checkouts(pool, waiters, count, loop, hold=True))
+    finally:
+        yield from pool.shutdown()
+
+
+@asyncio.coroutine
+def executemany(config, batch_size, rows, loop):
+    """Rows per second inserted with executemany in batches of
+    `batch_size` rows
+    """
+    pool = AsyncConnectionPool(size=1, loop=loop, **config)
+    data = [(i, 'name%d' % i) for i in range(batch_size)]
+    with (yield from pool) as cnx:
+        cursor = yield from cnx.async_cursor()
+        start = perf_counter()
+        for _ in range(max(rows // batch_size, 1)):
+            yield from cursor.executemany(
+                'INSERT INTO t (id, name) VALUES (%s, %s)', data
+            )
+        elapsed = perf_counter() - start
+    yield from pool.shutdown()
+    return max(rows // batch_size, 1) * batch_size / elapsed
+
+
+@asyncio.coroutine
+def connect_storm(config, connections, loop):
+    """Connections per second opened by `connections` tasks hitting
+    an empty pool at once
+    """
+    pool = AsyncConnectionPool(size=connections, queue_timeout=60.0,
+                               loop=loop, **config)
+    start = perf_counter()
+    opened = yield from asyncio.gather(
+        *[pool.get() for _ in range(connections)], loop=loop
+    )
+    elapsed = perf_counter() - start
+    for cnx in opened:
+        pool.release(cnx)
+    yield from pool.shutdown()
+    return connections / elapsed
+
+
+@asyncio.coroutine
+def inserts(config, rows, writers, write_behind, loop):
+    """Rows per second inserted by `writers` tasks one row at a time, each
+    row on a connection of its own or through a write-behind queue
+    """
+    pool = AsyncConnectionPool(size=4, queue_timeout=60.0, loop=loop,
+                               **config)
+    queue = pool.write_behind(batch_size=500)
+    operation = 'INSERT INTO t (id, name) VALUES (%s, %s)'
+
+    @asyncio.coroutine
+    def writer(ids):
+        acks = []
+        for i in ids:
+            if write_behind:
+                acks.append((yield from queue.enqueue(operation,
+                                                      (i, 'name'))))
+            else:
+                with (yield from pool) as cnx:
+                    cursor = yield from cnx.async_cursor()
+                    yield from cursor.execute(operation, (i, 'name'))
+                    yield from cnx.commit()
+        if acks:
+            yield from asyncio.gather(*acks, loop=loop)
+
+    start = perf_counter()
+    yield from asyncio.gather(
+        *[writer(range(i, rows, writers)) for i in range(writers)], loop=loop
+    )
+    elapsed = perf_counter() - start
+    yield from queue.close()
+    yield from pool.shutdown()
+    return rows / elapsed
+
+
+def run(sizes=(1, 4, 16), waiters=(1, 4, 16), checkout_count=200,
+        batch_sizes=(1, 10, 100, 1000), rows=10000, storms=(8, 32),
+        latency=0.0):
+    """Runs all scenarios and returns their results
+
+    :param sizes: pool sizes of the contention scenario
+    :param waiters: numbers of waiting tasks per connection
+    :param batch_sizes: numbers of rows per executemany call
+    :param storms: numbers of connections opened at once
+    :param float latency: seconds of latency of every server response
+    :rtype: dict
+    """
+    server = FakeMySQLServer(latency=latency)
+    loop = asyncio.new_event_loop()
+    results = {}
+
+    @asyncio.coroutine
+    def scenarios():
+        for size in sizes:
+            for ratio in waiters:
+                results['contention_%d_connections_%d_waiters_per_sec' % (
+                    size, size * ratio)] = yield from contention(
+                        server.config, size, size * ratio, checkout_count,
+                        loop)
+        for batch_size in batch_sizes:
+            results['executemany_batch_%d_rows_per_sec' % batch_size] = \
+                yield from executemany(server.config, batch_size, rows, loop)
+        for write_behind in (False, True):
+            results['inserts_%s_rows_per_sec' % (
+                'write_behind' if write_behind else 'single_row')] = \
+                yield from inserts(server.config, rows, 16, write_behind,
+                                   loop)
+        for connections in storms:
+            results['connect_storm_%d_per_sec' % connections] = \
+                yield from connect_storm(server.config, connections, loop)
+
+    with server:
+        try:
+            loop.run_until_complete(scenarios())
+        finally:
+            loop.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--rows', type=int, default=10000,
+                        help='rows inserted per executemany batch size')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds of latency of every server response')
+    args = parser.parse_args()
+
+    for name, value in sorted(run(rows=args.rows,
+                                  latency=args.latency).items()):
+        print('%-52s %12.2f' % (name, value))
+
+
+if __name__ == '__main__':
+    main()
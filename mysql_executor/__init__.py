@@ -4,14 +4,57 @@
 
 Non-blocking version of `mysql-connector-python
 <http://dev.mysql.com/doc/connector-python/en/index.html>`_ for asyncio.
+
+Classes are imported on first access (Python 3.7+), so importing the
+package does not load mysql.connector nor features which are not used.
+``from mysql_executor import *`` imports the core classes only. Other
+classes are imported by name, e.g. ``from mysql_executor import
+StatementStats``, or from their modules on older Python versions, e.g.
+``from mysql_executor.statements import StatementStats``.
 """
 
-from .async_pool import AsyncConnectionPool
-from .async_connection import AsyncMySQLConnection
-from .async_cursor import AsyncMySQLCursor
+import sys
+from importlib import import_module
 
 __version__ = '0.2.0'
 
+# public name -> module defining it
+_LAZY = {
+    'AsyncConnectionPool': '.async_pool',
+    'AsyncMySQLConnection': '.async_connection',
+    'AsyncMySQLCursor': '.async_cursor',
+    'AsyncMySQLSpooledCursor': '.async_spooled_cursor',
+    'KeysetScan': '.async_scan',
+    'TableExporter': '.async_export',
+    'Transaction': '.async_transaction',
+    'StatementStats': '.statements',
+    'WriteBehindQueue': '.async_write_behind',
+    'LoopWatchdog': '.utils',
+}
+
+__all__ = ['AsyncConnectionPool', 'AsyncMySQLConnection', 'AsyncMySQLCursor',
+           'version']
+
 
 def version():
-    return __version__
\ No newline at end of file
+    return __version__
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        try:
+            module = _LAZY[name]
+        except KeyError:
+            raise AttributeError('module %r has no attribute %r'
+                                 % (__name__, name)) from None
+        value = getattr(import_module(module, __name__), name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_LAZY))
+else:  # module __getattr__ is not supported, other classes are imported
+    # from their modules
+    from .async_pool import AsyncConnectionPool
+    from .async_connection import AsyncMySQLConnection
+    from .async_cursor import AsyncMySQLCursor
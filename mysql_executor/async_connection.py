@@ -11,28 +11,71 @@ from mysql.connector.cursor import (
     MySQLCursorNamedTuple, MySQLCursorBufferedNamedTuple, MySQLCursorPrepared
 )
 from mysql.connector import errors
+from mysql.connector.constants import ClientFlag, ServerCmd
 import asyncio
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
-from functools import partial
 
-from .utils import async_reconnectable
+from .utils import async_reconnectable, run_in_executor, quote_identifier
 from .async_cursor import AsyncMySQLCursor
+from .async_scan import KeysetScan
+from .async_transaction import Transaction, run_in_transaction
+from .network import count_compressed_traffic
 
 
 __all__ = ['AsyncMySQLConnection']
 
 
 class AsyncMySQLConnection(mysql.connector.MySQLConnection):
-    def __init__(self, loop=None):
+    """Asynchronous wrapper of a mysql.connector connection.
+
+    All I/O of the connection runs in its executor thread. With the
+    compressed protocol (``compress=True`` of :meth:`connect`), packets are
+    compressed and decompressed there as well, and bytes before and after
+    compression are counted in :attr:`traffic`.
+
+    :param loop: event loop, if not passed then default will be used
+    :param StatementStats statement_stats: statistics of statements
+        executed by cursors of the connection
+    """
+    def __init__(self, loop=None, statement_stats=None):
         super().__init__()
         self._executor = ThreadPoolExecutor(max_workers=1)
         self._loop = loop or asyncio.get_event_loop()
+        self._connect_config = {}
+        # set when the session is in an undefined state, e.g. after a query
+        # was killed; the pool resets such a connection on release
+        self._needs_reset = False
+        self._savepoint_seq = 0
+        # number of Transaction objects in progress, see async_transaction
+        self._transaction_depth = 0
+        # all keys exist up front, the executor thread only updates them,
+        # so the counter can be copied on the loop thread at any time
+        self._traffic = Counter(bytes_received=0, bytes_sent=0,
+                                payload_received=0, payload_sent=0)
+        self.statement_stats = statement_stats
+
+    @property
+    def traffic(self):
+        """Bytes of the compressed protocol: ``bytes_received`` and
+        ``bytes_sent`` on the wire, ``payload_received`` and
+        ``payload_sent`` before compression. The counter is updated in
+        the executor thread of the connection.
+
+        :rtype: collections.Counter
+        """
+        return self._traffic
+
+    def _open_connection(self):
+        super()._open_connection()
+        if self._client_flags & ClientFlag.COMPRESS:
+            count_compressed_traffic(self._socket, self._traffic)
 
     @asyncio.coroutine
     def _run_in_executor(self, fn, *args, **kwargs):
         return (
-            yield from self._loop.run_in_executor(
-                self._executor, partial(fn, *args, **kwargs)
+            yield from run_in_executor(
+                self._loop, self._executor, fn, *args, **kwargs
             )
         )
 
@@ -44,8 +87,19 @@ class AsyncMySQLConnection(mysql.connector.MySQLConnection):
         arguments are given, it will use the already configured or default
         values.
         """
+        self._connect_config.update(kwargs)
         yield from self._run_in_executor(super().connect, **kwargs)
 
+    @asyncio.coroutine
+    def _connect_to(self, address, **kwargs):
+        """Coroutine. Connects like :meth:`connect` to `address`, resolved
+        from the ``host`` of `kwargs`. The host name is kept for reconnects
+        and ``KILL QUERY``, so they follow changes of its address.
+        """
+        yield from self.connect(**dict(kwargs, host=address))
+        self._host = self._connect_config['host'] = \
+            kwargs.get('host', '127.0.0.1')
+
     @asyncio.coroutine
     def disconnect(self):
         """Coroutine. Disconnect from the MySQL server
@@ -78,6 +132,58 @@ class AsyncMySQLConnection(mysql.connector.MySQLConnection):
             else:
                 break
 
+    @asyncio.coroutine
+    def discard_results(self):
+        """Coroutine. Consumes and discards an unread result in the executor
+        """
+        if self.unread_result:
+            yield from self._run_in_executor(self.consume_results)
+
+    def _reset_connection(self):
+        if self._server_version < (5, 7, 3):
+            # COM_RESET_CONNECTION is not supported, start a new session
+            mysql.connector.MySQLConnection.disconnect(self)
+            mysql.connector.MySQLConnection.connect(self)
+            return
+
+        self._handle_ok(self._send_cmd(
+            getattr(ServerCmd, 'RESET_CONNECTION', 31)
+        ))
+        self._post_connection()
+
+    @asyncio.coroutine
+    def reset_connection(self):
+        """Coroutine. Resets the session state without re-authenticating
+
+        COM_RESET_CONNECTION rolls back an open transaction and drops
+        temporary tables, user variables and prepared statements. Session
+        settings given when connecting, e.g. autocommit or character set,
+        are restored afterwards. MySQL servers older than 5.7.3 are
+        reconnected instead.
+        """
+        yield from self.discard_results()
+        yield from self._run_in_executor(self._reset_connection)
+        self._needs_reset = False
+
+    def _kill_query(self, connection_id):
+        admin = mysql.connector.MySQLConnection(**self._connect_config)
+        try:
+            admin.cmd_query('KILL QUERY %d' % connection_id)
+        finally:
+            admin.close()
+
+    @asyncio.coroutine
+    def kill_query(self):
+        """Coroutine. Stops the statement running on this connection
+
+        ``KILL QUERY`` is sent over a short-lived separate connection,
+        since this one is busy. The connection is marked to be reset when
+        it is released to the pool.
+        """
+        self._needs_reset = True
+        yield from run_in_executor(self._loop, None, self._kill_query,
+                                   self.connection_id)
+
     @asyncio.coroutine
     def is_connected(self):
         """Coroutine. Reports whether the connection to MySQL Server
@@ -135,10 +241,79 @@ class AsyncMySQLConnection(mysql.connector.MySQLConnection):
         """Coroutine. Rollback current transaction"""
         yield from self._run_in_executor(super().rollback)
 
+    def _next_savepoint_name(self):
+        self._savepoint_seq += 1
+        return 'mysql_executor_sp%d' % self._savepoint_seq
+
+    @asyncio.coroutine
+    def savepoint(self, name):
+        """Coroutine. Sets a named savepoint of the current transaction"""
+        yield from self._run_in_executor(
+            self.cmd_query, 'SAVEPOINT ' + quote_identifier(name)
+        )
+
+    @asyncio.coroutine
+    def rollback_to_savepoint(self, name):
+        """Coroutine. Rolls the current transaction back to the savepoint
+        keeping the work done before it
+        """
+        yield from self._run_in_executor(
+            self.cmd_query, 'ROLLBACK TO SAVEPOINT ' + quote_identifier(name)
+        )
+
+    @asyncio.coroutine
+    def release_savepoint(self, name):
+        """Coroutine. Removes the savepoint, the work done after it stays
+        in the current transaction
+        """
+        yield from self._run_in_executor(
+            self.cmd_query, 'RELEASE SAVEPOINT ' + quote_identifier(name)
+        )
+
+    def transaction(self, **kwargs):
+        """Returns an asynchronous context manager of a transaction
+        committing it on success and rolling it back on errors:
+        >>> async with cnx.transaction(readonly=True):
+        >>>     ...
+
+        Inside of another transaction of this connection, a nested
+        transaction backed by a savepoint is returned.
+
+        Keyword arguments are passed to :meth:`start_transaction`.
+
+        :rtype: Transaction
+        """
+        return Transaction(self, **kwargs)
+
+    @asyncio.coroutine
+    def run_in_transaction(self, fn, *args, retries=3, backoff=0.05,
+                           max_backoff=1.0, **kwargs):
+        """Coroutine. Runs ``fn(cnx, *args)`` in a transaction, repeating
+        it on deadlocks and lock wait timeouts, see
+        :func:`run_in_transaction`.
+
+        For example:
+            >>> @asyncio.coroutine
+            >>> def transfer(cnx, amount):
+            >>>     cursor = yield from cnx.async_cursor()
+            >>>     yield from cursor.execute(...)
+            >>> yield from cnx.run_in_transaction(transfer, 10)
+
+        Returns result of fn.
+        """
+        return (
+            yield from run_in_transaction(
+                self, fn, *args, retries=retries, backoff=backoff,
+                max_backoff=max_backoff, loop=self._loop, **kwargs
+            )
+        )
+
     @asyncio.coroutine
     @async_reconnectable
     def async_cursor(self, buffered=None, raw=None, prepared=None,
-                     cursor_class=None, dictionary=None, named_tuple=None):
+                     cursor_class=None, dictionary=None, named_tuple=None,
+                     decode_executor=None, decode_chunk_size=1000,
+                     converters=None, max_buffer_size=None, spool_dir=None):
         """Coroutine. Instantiates and returns a cursor
 
         .. note:: This method tries to reconnect if connection is not available
@@ -158,6 +333,25 @@ class AsyncMySQLConnection(mysql.connector.MySQLConnection):
         Raises ProgrammingError when cursor_class is not a subclass of
         CursorBase. Raises ValueError when cursor is not available.
 
+        When decode_executor, usually a ProcessPoolExecutor, is given,
+        rows are fetched raw and converted to Python types in the executor
+        in chunks of decode_chunk_size rows. It is available for cursors
+        returning tuples only.
+
+        When converters, a dict of functions converting raw values of
+        columns by their names or positions, is given, rows are fetched
+        raw and converted by decoders built once per result set, with
+        converters overriding the default ones. An empty dict enables
+        these decoders without overrides. With decode_executor, converters
+        have to be picklable.
+
+        When max_buffer_size is given, an AsyncMySQLSpooledCursor is
+        returned: the result is read at execution like with buffered, but
+        rows taking more than about max_buffer_size bytes are spilled to
+        a temporary file in spool_dir. Rows are converted like with
+        converters. It is not available with raw, dictionary, named_tuple,
+        prepared or decode_executor.
+
         Returns a cursor-object
         """
         if self._unread_result is True:
@@ -171,9 +365,35 @@ class AsyncMySQLConnection(mysql.connector.MySQLConnection):
             return AsyncMySQLCursor(
                 cursor_class(self),
                 self._executor,
-                loop=self._loop
+                loop=self._loop,
+                statement_stats=self.statement_stats
             )
 
+        if max_buffer_size is not None:
+            if raw or dictionary or named_tuple or prepared or \
+               decode_executor is not None:
+                raise ValueError('max_buffer_size is not available with '
+                                 'raw, dictionary, named_tuple, prepared '
+                                 'or decode_executor')
+            # imported on use, it loads tempfile and mmap
+            from .async_spooled_cursor import AsyncMySQLSpooledCursor
+            return AsyncMySQLSpooledCursor(
+                MySQLCursorRaw(self),
+                self._executor,
+                max_buffer_size=max_buffer_size,
+                spool_dir=spool_dir,
+                loop=self._loop,
+                converters=converters,
+                statement_stats=self.statement_stats
+            )
+
+        if decode_executor is not None or converters is not None:
+            if raw or dictionary or named_tuple or prepared:
+                raise ValueError('decode_executor and converters are not '
+                                 'available with raw, dictionary, '
+                                 'named_tuple or prepared')
+            raw = True
+
         buffered = buffered or self._buffered
         raw = raw or self._raw
 
@@ -204,7 +424,11 @@ class AsyncMySQLConnection(mysql.connector.MySQLConnection):
             return AsyncMySQLCursor(
                 (types[cursor_type])(self),
                 self._executor,
-                loop=self._loop
+                loop=self._loop,
+                decode_executor=decode_executor,
+                decode_chunk_size=decode_chunk_size,
+                converters=converters,
+                statement_stats=self.statement_stats
             )
         except KeyError:
             args = ('buffered', 'raw', 'dictionary', 'named_tuple', 'prepared')
@@ -212,5 +436,14 @@ class AsyncMySQLConnection(mysql.connector.MySQLConnection):
                              ', '.join([args[i] for i in range(5)
                                         if cursor_type & (1 << i) != 0]))
 
+    def scan(self, table, key_columns, **kwargs):
+        """Returns a :class:`KeysetScan` reading `table` in pages ordered by
+        `key_columns` through this connection. Keyword arguments are passed
+        to :class:`KeysetScan`.
+
+        :rtype: KeysetScan
+        """
+        return KeysetScan(self, table, key_columns, loop=self._loop, **kwargs)
+
     def __del__(self):
         self._executor.shutdown(False)
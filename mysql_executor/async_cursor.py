@@ -7,30 +7,198 @@ import mysql.connector
 import mysql.connector.cursor
 from mysql.connector import errorcode
 import asyncio
+from concurrent.futures import TimeoutError
 from functools import partial
 
+from .conversion import decode_rows, column_decoders, apply_decoders
+from .utils import run_in_executor, add_max_execution_time, log
+
 
 __all__ = ['AsyncMySQLCursor']
 
+# statement stopped by MAX_EXECUTION_TIME, missing in older connectors
+ER_QUERY_TIMEOUT = getattr(errorcode, 'ER_QUERY_TIMEOUT', 3024)
+# minimal seconds the MAX_EXECUTION_TIME hint outlasts the client timeout
+SERVER_TIMEOUT_MARGIN = 1.0
+
 
 class AsyncMySQLCursor(mysql.connector.cursor.MySQLCursor):
+    """Asynchronous wrapper of a mysql.connector cursor.
+
+    When `decode_executor` is passed, `base_cursor` has to be a raw cursor.
+    Fetched rows are then shipped in chunks of `decode_chunk_size` rows to
+    the executor, usually a :class:`concurrent.futures.ProcessPoolExecutor`,
+    and converted to Python types there, so decoding of large result sets
+    is not serialized by the GIL of this process.
+
+    When `converters` is passed, `base_cursor` has to be a raw cursor as
+    well. Rows are converted in the executor of the connection by
+    decoders built once per result set from :attr:`description`, see
+    :func:`conversion.column_decoders`. `converters` overrides them per
+    column.
+
+    When `statement_stats` is passed, executions of statements and rows
+    fetched are accounted there, see :class:`statements.StatementStats`.
+    """
     def __init__(self,
                  base_cursor: mysql.connector.cursor.MySQLCursor,
                  executor,
                  *,
-                 loop=None):
+                 loop=None,
+                 decode_executor=None,
+                 decode_chunk_size=1000,
+                 converters=None,
+                 statement_stats=None):
         super().__init__()
         self._cursor = base_cursor
         self._executor = executor
         self._loop = loop or asyncio.get_event_loop()
+        self._decode_executor = decode_executor
+        self._decode_chunk_size = decode_chunk_size
+        self._converters = converters
+        self._decoders = None
+        self._decoders_description = None
+        self._statement_stats = statement_stats
+        self._statement = None  # statistics of the last statement
 
     @asyncio.coroutine
     def _run_in_executor(self, fn, *args, **kwargs):
         return (
-            yield from self._loop.run_in_executor(
-                self._executor, partial(fn, *args, **kwargs)
+            yield from run_in_executor(
+                self._loop, self._executor, fn, *args, **kwargs
+            )
+        )
+
+    def _decode_args(self):
+        converter = self._cursor._connection.converter
+        return self._cursor.description, converter.charset, \
+            converter.use_unicode
+
+    @property
+    def _decodes(self):
+        """Whether the cursor converts raw rows itself"""
+        return self._decode_executor is not None or \
+            self._converters is not None
+
+    def _column_decoders(self):
+        description = self._cursor.description
+        if description is not self._decoders_description:
+            self._decoders = column_decoders(*self._decode_args(),
+                                             converters=self._converters)
+            self._decoders_description = description
+        return self._decoders
+
+    @asyncio.coroutine
+    def _decode(self, rows):
+        if self._decode_executor is None or not rows:
+            return rows
+
+        description, charset, use_unicode = self._decode_args()
+        decode = partial(decode_rows, description=description,
+                         charset=charset, use_unicode=use_unicode,
+                         converters=self._converters)
+        size = self._decode_chunk_size
+        chunks = yield from asyncio.gather(
+            *[self._loop.run_in_executor(self._decode_executor,
+                                         decode, rows[i:i + size])
+              for i in range(0, len(rows), size)],
+            loop=self._loop
+        )
+        return [row for chunk in chunks for row in chunk]
+
+    def _fetchone_decoded(self):
+        row = self._cursor.fetchone()
+        if row is None:
+            return None
+        # a single row is not worth a trip to another process
+        return apply_decoders([row], self._column_decoders())[0]
+
+    def _fetchmany_decoded(self, size):
+        return apply_decoders(self._cursor.fetchmany(size),
+                              self._column_decoders())
+
+    def _fetchall_decoded(self):
+        return apply_decoders(self._cursor.fetchall(),
+                              self._column_decoders())
+
+    @asyncio.coroutine
+    def _stop(self, future):
+        """Kills the statement being run by `future` and waits for it"""
+        try:
+            yield from self._cursor._connection.kill_query()
+        except Exception as err:
+            log.warning('KILL QUERY failed: %r', err)
+        try:
+            yield from future
+        except Exception:
+            pass  # the statement is interrupted
+
+    @asyncio.coroutine
+    def _run_with_timeout(self, timeout, fn, *args):
+        future = run_in_executor(self._loop, self._executor, fn, *args)
+        if timeout is None:
+            return (yield from future)
+
+        try:
+            return (
+                yield from asyncio.wait_for(
+                    asyncio.shield(future, loop=self._loop),
+                    timeout, loop=self._loop
+                )
             )
+        except asyncio.TimeoutError:
+            yield from self._stop(future)
+            raise TimeoutError('Query execution time exceeded')
+        except asyncio.CancelledError:
+            self._loop.create_task(self._stop(future))
+            raise
+        except mysql.connector.errors.DatabaseError as err:
+            if err.errno != ER_QUERY_TIMEOUT:
+                raise
+            # stopped by MAX_EXECUTION_TIME before the client timeout fired
+            self._cursor._connection._needs_reset = True
+            raise TimeoutError('Query execution time exceeded') from err
+
+    def _add_max_execution_time(self, operation, timeout):
+        """Adds the MAX_EXECUTION_TIME hint to a SELECT `operation`.
+
+        The hint is a fallback for the case the client timeout cannot stop
+        the statement, so it expires `SERVER_TIMEOUT_MARGIN` later.
+        """
+        if timeout is None or \
+           self._cursor._connection.get_server_version() < (5, 7, 8):
+            return operation
+        return add_max_execution_time(
+            operation, timeout + max(SERVER_TIMEOUT_MARGIN, timeout / 10)
+        )
+
+    @asyncio.coroutine
+    def _execute_recorded(self, operation, timeout, fn, *args):
+        """Runs `fn` like :meth:`_run_with_timeout` and accounts the
+        execution of `operation` in the statement statistics
+        """
+        if self._statement_stats is None:
+            return (yield from self._run_with_timeout(timeout, fn, *args))
+
+        self._statement = None
+        start = self._loop.time()
+        try:
+            result = yield from self._run_with_timeout(timeout, fn, *args)
+        except Exception:
+            self._statement_stats.record(operation, self._loop.time() - start,
+                                         error=True)
+            raise
+        rows_affected = 0
+        if not self._cursor.description:
+            rows_affected = max(self._cursor.rowcount, 0)
+        self._statement = self._statement_stats.record(
+            operation, self._loop.time() - start, rows_affected
         )
+        return result
+
+    def _count_rows(self, count):
+        if self._statement is not None:
+            self._statement.rows_returned += count
 
     @asyncio.coroutine
     def callproc(self, procname, args=()):
@@ -59,11 +227,38 @@ class AsyncMySQLCursor(mysql.connector.cursor.MySQLCursor):
         yield from self._run_in_executor(self._cursor.callproc, procname, args)
 
     def close(self):
-        """Close the cursor."""
+        """Close the cursor.
+
+        .. note:: Unread rows are consumed on the calling thread,
+            use :meth:`aclose` to not block the event loop
+        """
         self._cursor.close()
 
+    def _close(self):
+        cnx = self._cursor._connection
+        if cnx is not None and cnx.unread_result:
+            cnx.consume_results()
+        return self._cursor.close()
+
+    @asyncio.coroutine
+    def aclose(self):
+        """Coroutine. Close the cursor
+
+        Unread rows of the current result are consumed and discarded in
+        the executor of the connection.
+        """
+        yield from self._run_in_executor(self._close)
+
+    @asyncio.coroutine
+    def __aenter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __aexit__(self, *args):
+        yield from self.aclose()
+
     @asyncio.coroutine
-    def execute(self, operation, params=(), multi=False):
+    def execute(self, operation, params=(), multi=False, timeout=None):
         """Coroutine. Executes the given operation
 
         Executes the given operation substituting any markers with
@@ -79,16 +274,26 @@ class AsyncMySQLCursor(mysql.connector.cursor.MySQLCursor):
         If warnings where generated, and connection.get_warnings is True, then
         self._warnings will be a list containing these warnings.
 
+        When the statement does not complete in timeout seconds, it is
+        stopped on the server with KILL QUERY and TimeoutError is raised.
+        SELECT statements additionally get the MAX_EXECUTION_TIME hint
+        on servers supporting it, expiring a bit after timeout, as
+        a fallback.
+
         Returns an iterator when multi is True, otherwise None.
         """
+        statement = operation
+        if not multi:
+            operation = self._add_max_execution_time(operation, timeout)
         return (
-            yield from self._run_in_executor(
-                self._cursor.execute, operation, params, multi
+            yield from self._execute_recorded(
+                statement, timeout, self._cursor.execute, operation, params,
+                multi
             )
         )
 
     @asyncio.coroutine
-    def executemany(self, operation, seqparams):
+    def executemany(self, operation, seqparams, timeout=None):
         """Coroutine. Execute the given operation multiple times
 
         The executemany() method will execute the operation iterating
@@ -109,9 +314,12 @@ class AsyncMySQLCursor(mysql.connector.cursor.MySQLCursor):
 
         Results are discarded. If they are needed, consider looping over
         data using the execute() method.
+
+        The timeout argument has the same meaning as for execute().
         """
-        yield from self._run_in_executor(self._cursor.executemany,
-                                         operation, seqparams)
+        yield from self._execute_recorded(operation, timeout,
+                                          self._cursor.executemany,
+                                          operation, seqparams)
 
     @asyncio.coroutine
     def fetchone(self):
@@ -119,7 +327,13 @@ class AsyncMySQLCursor(mysql.connector.cursor.MySQLCursor):
 
         Returns a tuple or None.
         """
-        return (yield from self._run_in_executor(self._cursor.fetchone))
+        if self._decodes:
+            row = yield from self._run_in_executor(self._fetchone_decoded)
+        else:
+            row = yield from self._run_in_executor(self._cursor.fetchone)
+        if row is not None:
+            self._count_rows(1)
+        return row
 
     @asyncio.coroutine
     def fetchmany(self, size=1):
@@ -130,7 +344,15 @@ class AsyncMySQLCursor(mysql.connector.cursor.MySQLCursor):
         The number of rows returned can be specified using the size argument,
         which defaults to one
         """
-        return (yield from self._run_in_executor(self._cursor.fetchmany, size))
+        if self._decodes and self._decode_executor is None:
+            rows = yield from self._run_in_executor(self._fetchmany_decoded,
+                                                    size)
+        else:
+            rows = yield from self._run_in_executor(self._cursor.fetchmany,
+                                                    size)
+            rows = yield from self._decode(rows)
+        self._count_rows(len(rows))
+        return rows
 
     @asyncio.coroutine
     def fetchall(self):
@@ -138,7 +360,13 @@ class AsyncMySQLCursor(mysql.connector.cursor.MySQLCursor):
 
         Returns a list of tuples.
         """
-        return (yield from self._run_in_executor(self._cursor.fetchall))
+        if self._decodes and self._decode_executor is None:
+            rows = yield from self._run_in_executor(self._fetchall_decoded)
+        else:
+            rows = yield from self._run_in_executor(self._cursor.fetchall)
+            rows = yield from self._decode(rows)
+        self._count_rows(len(rows))
+        return rows
 
     @asyncio.coroutine
     def fetchwarnings(self):
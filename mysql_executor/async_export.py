@@ -0,0 +1,340 @@
+"""
+.. module:: async_export
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import asyncio
+import base64
+import csv
+import datetime
+import decimal
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from .conversion import decode_rows
+from .utils import quote_identifier, select_statement
+
+__all__ = ['TableExporter']
+
+FORMATS = ('csv', 'jsonl')
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return str(value)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    if isinstance(value, set):
+        return sorted(value)
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def encode_rows(rows, description, charset, use_unicode, fmt):
+    """Decodes raw rows and serializes them as CSV or newline-delimited
+    JSON. Runs in a worker process of :class:`TableExporter`.
+
+    :rtype: str
+    """
+    rows = decode_rows(rows, description, charset, use_unicode)
+    if fmt == 'jsonl':
+        names = [d[0] for d in description]
+        return ''.join(
+            json.dumps(dict(zip(names, row)), default=_json_default) + '\n'
+            for row in rows
+        )
+
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue()
+
+
+class _StreamWriter:
+    """Writes chunks of text to a file in its own thread, so the event loop
+    is never blocked by the file system.
+    """
+    def __init__(self, fileobj, *, loop):
+        self._file = fileobj
+        self._loop = loop
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    @asyncio.coroutine
+    def write(self, data):
+        if data:
+            yield from self._loop.run_in_executor(
+                self._executor, self._file.write, data
+            )
+
+    @asyncio.coroutine
+    def close(self):
+        yield from self._loop.run_in_executor(self._executor,
+                                              self._file.flush)
+        self._executor.shutdown(False)
+
+
+class _PoolSlots:
+    """Admits as many ranges at once as the pool has connections. The
+    size is read at every admission, so it follows resizing of the pool.
+    """
+    def __init__(self, pool, *, loop):
+        self._pool = pool
+        self._active = 0
+        self._condition = asyncio.Condition(loop=loop)
+
+    @asyncio.coroutine
+    def acquire(self):
+        yield from self._condition.acquire()
+        try:
+            yield from self._condition.wait_for(
+                lambda: self._active < self._pool.size
+            )
+            self._active += 1
+        finally:
+            self._condition.release()
+
+    @asyncio.coroutine
+    def release(self):
+        yield from self._condition.acquire()
+        try:
+            self._active -= 1
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+
+class TableExporter:
+    """Exports a table concurrently through several pool connections.
+
+    The table is split into ranges of its key column. Ranges are bounded
+    from ``MIN``/``MAX`` of the key when it is numeric or sampled from the
+    row estimate of the index statistics otherwise. Every range is read on
+    its own connection of the pool, raw rows are decoded and serialized in
+    a process pool and written in chunks as they arrive, so throughput
+    scales with cores and connections. Rows are not written in key order.
+
+    Example:
+    >>> exporter = TableExporter(pool, 'orders', 'id', fmt='jsonl')
+    >>> with open('orders.jsonl', 'w') as f:
+    >>>     count = yield from exporter.export(f)
+
+    :param pool: :class:`AsyncConnectionPool` the table is read through
+    :param str table: table name, may be qualified with the database
+    :param str key_column: name of an indexed column, usually the first
+        column of the primary key
+    :param columns: names of the exported columns, all by default
+    :param str where: additional filter, may contain ``%s`` markers
+    :param tuple params: parameters for markers of `where`
+    :param int partitions: number of ranges, pool size by default
+    :param str fmt: ``'csv'`` or ``'jsonl'``
+    :param bool header: write a header line of column names to CSV
+    :param int batch_size: number of rows decoded by one worker task
+    :param executor: :class:`concurrent.futures.ProcessPoolExecutor` used
+        for decoding, a private one is created when it is not passed
+    :raise ValueError: if arguments are inappropriate
+    """
+    def __init__(self, pool, table, key_column, *, columns=None, where=None,
+                 params=(), partitions=None, fmt='csv', header=True,
+                 batch_size=5000, executor=None, loop=None):
+        if fmt not in FORMATS:
+            raise ValueError('Unknown format %r, expected one of %s' %
+                             (fmt, ', '.join(FORMATS)))
+        partitions = partitions or pool.size
+        if partitions < 1:
+            raise ValueError('partitions is less than 1')
+        if batch_size < 1:
+            raise ValueError('batch_size is less than 1')
+
+        self._pool = pool
+        self._table = table
+        self._key_column = key_column
+        self._columns = tuple(columns) if columns else None
+        self._where = where
+        self._params = tuple(params)
+        self._partitions = partitions
+        self._fmt = fmt
+        self._header = header
+        self._batch_size = batch_size
+        self._executor = executor
+        self._loop = loop or asyncio.get_event_loop()
+
+    @asyncio.coroutine
+    def _query(self, stmt, params=()):
+        with (yield from self._pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            try:
+                yield from cursor.execute(stmt, params)
+                return (yield from cursor.fetchall())
+            finally:
+                cursor.close()
+
+    @asyncio.coroutine
+    def _sample_bounds(self, key):
+        """Boundaries taken at evenly spaced offsets of the key index, the
+        number of rows is estimated from the table statistics.
+        """
+        if '.' in self._table:
+            schema, table = self._table.split('.', 1)
+            rows = yield from self._query(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s',
+                (schema, table))
+        else:
+            rows = yield from self._query(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                (self._table,))
+        estimate = rows[0][0] if rows and rows[0][0] else 0
+
+        stmt, params = select_statement(self._table, key, self._where,
+                                        self._params)
+        step = estimate // self._partitions
+        bounds = []
+        if step:
+            for i in range(1, self._partitions):
+                row = yield from self._query(
+                    stmt + ' ORDER BY %s LIMIT 1 OFFSET %d' % (key, i * step),
+                    params)
+                if not row:
+                    break
+                if not bounds or row[0][0] > bounds[-1]:
+                    bounds.append(row[0][0])
+        return bounds
+
+    @asyncio.coroutine
+    def partition_bounds(self):
+        """Coroutine. Returns inner boundaries of the key ranges. ``n``
+        boundaries give ``n + 1`` ranges, the first and the last ones are
+        open.
+
+        :rtype: list
+        """
+        key = quote_identifier(self._key_column)
+        rows = yield from self._query(*select_statement(
+            self._table, 'MIN(%s), MAX(%s)' % (key, key), self._where,
+            self._params
+        ))
+        low, high = rows[0]
+        if low is None or low == high:
+            return []
+
+        if isinstance(low, int) and isinstance(high, int):
+            width = (high - low) / self._partitions
+            bounds = sorted(set(
+                low + int(width * i) for i in range(1, self._partitions)
+            ))
+            return [b for b in bounds if low < b <= high]
+
+        return (yield from self._sample_bounds(key))
+
+    def _statement(self, low, high):
+        key = quote_identifier(self._key_column)
+        conditions = []
+        if low is not None:
+            conditions.append(('%s >= %%s' % key, (low,)))
+        if high is not None:
+            conditions.append(('%s < %%s' % key, (high,)))
+        return select_statement(self._table, self._columns, self._where,
+                                self._params, conditions)
+
+    @asyncio.coroutine
+    def _export_range(self, low, high, slots, executor, writer, header):
+        stmt, params = self._statement(low, high)
+        count = 0
+        pending = []
+        yield from slots.acquire()
+        try:
+            with (yield from self._pool) as cnx:
+                cursor = yield from cnx.async_cursor(raw=True)
+                try:
+                    yield from cursor.execute(stmt, params)
+                    description = cursor.description
+                    converter = cnx.converter
+                    encode = partial(encode_rows,
+                                     description=description,
+                                     charset=converter.charset,
+                                     use_unicode=converter.use_unicode,
+                                     fmt=self._fmt)
+                    yield from header(description)
+
+                    while True:
+                        rows = yield from cursor.fetchmany(self._batch_size)
+                        if not rows:
+                            break
+                        count += len(rows)
+                        # the next chunk is read while this one is decoded
+                        pending.append(self._loop.run_in_executor(
+                            executor, encode, rows
+                        ))
+                        while len(pending) > 1:
+                            yield from writer.write(
+                                (yield from pending.pop(0))
+                            )
+                finally:
+                    # unread rows of a failed range are discarded off the
+                    # event loop
+                    yield from cursor.aclose()
+
+            for future in pending:
+                yield from writer.write((yield from future))
+        except:
+            for future in pending:
+                future.cancel()
+            raise
+        finally:
+            yield from slots.release()
+        return count
+
+    @asyncio.coroutine
+    def export(self, fileobj):
+        """Coroutine. Writes the table to a text file object
+
+        :param fileobj: file object opened for writing text
+        :return: number of exported rows
+        :rtype: int
+        """
+        bounds = yield from self.partition_bounds()
+        ranges = list(zip([None] + bounds, bounds + [None]))
+
+        writer = _StreamWriter(fileobj, loop=self._loop)
+        executor = self._executor or ProcessPoolExecutor()
+        header_lock = asyncio.Lock(loop=self._loop)
+        # ranges beyond the pool size wait here rather than in the pool
+        # queue, which would time out
+        slots = _PoolSlots(self._pool, loop=self._loop)
+        header_written = []
+
+        @asyncio.coroutine
+        def header(description):
+            if self._fmt != 'csv' or not self._header:
+                return
+            with (yield from header_lock):
+                if not header_written:
+                    out = io.StringIO()
+                    csv.writer(out).writerow([d[0] for d in description])
+                    yield from writer.write(out.getvalue())
+                    header_written.append(True)
+
+        tasks = [
+            self._loop.create_task(self._export_range(
+                low, high, slots, executor, writer, header
+            ))
+            for low, high in ranges
+        ]
+        try:
+            counts = yield from asyncio.gather(*tasks, loop=self._loop)
+        except:
+            # the other ranges stop before the executors are shut down
+            for task in tasks:
+                task.cancel()
+            yield from asyncio.wait(tasks, loop=self._loop)
+            raise
+        finally:
+            yield from writer.close()
+            if self._executor is None:
+                executor.shutdown(False)
+        return sum(counts)
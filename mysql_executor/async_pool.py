@@ -4,12 +4,16 @@
 """
 
 import asyncio
-from asyncio import Future, Event
-from collections import deque
+from asyncio import Future, Event, Semaphore
+from collections import deque, Counter
 from concurrent.futures import TimeoutError
 
 from .async_connection import AsyncMySQLConnection
-from .utils import ContextManager
+from .async_scan import KeysetScan
+from .async_transaction import run_in_transaction
+from .async_write_behind import WriteBehindQueue
+from .network import DNSCache
+from .utils import ContextManager, log
 
 __all__ = ['AsyncConnectionPool']
 
@@ -20,23 +24,103 @@ class AsyncConnectionPool:
     :param int size: size (number of connection) of the pool.
     :param float queue_timeout: time out when client is waiting connection
         from pool
+    :param bool reset_session: reset session state of every released
+        connection with COM_RESET_CONNECTION, see
+        :meth:`AsyncMySQLConnection.reset_connection`
+    :param int key_limit: maximal number of connections simultaneously
+        issued for one key of :func:`get`, unlimited by default
+    :param dict key_limits: limits of particular keys overriding
+        `key_limit`
+    :param int overflow: number of connections shared by all keys which
+        may be issued to a key above its limit
+    :param bool sticky: issue to a key the connection it used last time,
+        when that one is free
+    :param int min_size: lower bound of the size in adaptive mode
+    :param int max_size: upper bound of the size, enables adaptive mode.
+        The pool then grows when callers wait for connections longer than
+        `target_wait` and shrinks when connections stay idle for
+        `idle_timeout`. Every connection has its own executor thread, so
+        this also adapts the executor capacity.
+    :param float adapt_interval: seconds between adaptations
+    :param float target_wait: acceptable mean time of waiting for
+        a connection
+    :param float idle_timeout: seconds without waiting for a connection
+        after which the pool shrinks
+    :param int connect_concurrency: maximal number of connections being
+        opened at once, unlimited by default
+    :param float connect_rate: maximal number of connections opened per
+        second, unlimited by default. Together with `connect_concurrency`
+        it keeps a pool reopening all of its connections, e.g. after
+        a restart of the server, from overloading the server or hitting
+        its ``max_connect_errors``.
+    :param StatementStats statement_stats: statistics of statements
+        executed on connections of the pool, may be shared by pools
+    :param float dns_ttl: seconds the address of ``host`` is cached for,
+        so that connections opened at once do not resolve it each,
+        see :class:`network.DNSCache`. Resolved for every connection by
+        default. Reconnects of open connections resolve ``host`` again
+        without the cache. The pool connects to the cached address, so
+        TLS verification of the server's host name, where the connector
+        does it, sees the address: leave `dns_ttl` unset then.
     :param loop: event loop, if not passed then default will be used
     :param config: MySql connection config see
-        `doc. <http://dev.mysql.com/doc/connector-python/en/connector-python-connectargs.html>`_
+        `doc. <http://dev.mysql.com/doc/connector-python/en/connector-python-connectargs.html>`_,
+        ``compress=True`` enables the compressed protocol, which pays off
+        for large results over slow networks, see ``bytes_saved`` of
+        :attr:`stats`
     :raise ValueError: if the `size` is inappropriate
     """
-    def __init__(self, size=1, queue_timeout=15.0, *, loop=None, **config):
+    def __init__(self, size=1, queue_timeout=15.0, *, reset_session=False,
+                 key_limit=None, key_limits=None, overflow=0, sticky=False,
+                 min_size=None, max_size=None, adapt_interval=1.0,
+                 target_wait=0.05, idle_timeout=60.0,
+                 connect_concurrency=None, connect_rate=None, dns_ttl=None,
+                 statement_stats=None, loop=None, **config):
         assert size > 0, 'DBPool.size must be greater than 0'
         if size < 1:
             raise ValueError('DBPool.size is less than 1, '
                              'connections won"t be established')
+        min_size = min_size or 1
+        if max_size is not None:
+            if not 1 <= min_size <= max_size:
+                raise ValueError('DBPool.min_size and DBPool.max_size '
+                                 'must satisfy 1 <= min_size <= max_size')
+            size = min(max(size, min_size), max_size)
         self._pool = set()
         self._busy_items = set()
         self._size = size
         self._pending_futures = deque()
         self._queue_timeout = queue_timeout
+        self._reset_session = reset_session
+        self._key_limit = key_limit
+        self._key_limits = dict(key_limits or {})
+        self._overflow = overflow
+        self._sticky = sticky
+        self._key_usage = Counter()
+        self._overflow_usage = 0
+        self._issued = {}  # connection -> (key, issued from overflow)
+        self._last_used = {}  # key -> connection
+        self._min_size = min_size
+        self._max_size = max_size
+        self._adapt_interval = adapt_interval
+        self._target_wait = target_wait
+        self._idle_timeout = idle_timeout
+        self._adapter = None
+        self._peak_busy = 0
+        self._stats = Counter()
+        self._closed_traffic = Counter()  # of connections left the pool
         self._loop = loop or asyncio.get_event_loop()
         self.config = config
+        self._connect_semaphore = None
+        if connect_concurrency is not None:
+            self._connect_semaphore = Semaphore(connect_concurrency,
+                                                loop=self._loop)
+        self._connect_rate = connect_rate
+        self._next_connect = 0.0
+        self._statement_stats = statement_stats
+        self._dns_cache = None
+        if dns_ttl is not None and 'unix_socket' not in config:
+            self._dns_cache = DNSCache(dns_ttl, loop=self._loop)
 
         self._shutdown_event = Event(loop=self._loop)
         self._shutdown_event.set()
@@ -68,6 +152,195 @@ class AsyncConnectionPool:
         """
         return self._size
 
+    @property
+    def min_size(self):
+        """Lower bound of :attr:`size` in adaptive mode
+
+        :rtype: int
+        """
+        return self._min_size
+
+    @property
+    def max_size(self):
+        """Upper bound of :attr:`size`, ``None`` when the size is fixed
+
+        :rtype: int
+        """
+        return self._max_size
+
+    @property
+    def stats(self):
+        """Counters of the pool: ``checkouts``, ``waits`` (checkouts which
+        waited for a connection), ``wait_time`` (seconds spent waiting),
+        ``timeouts``, ``grown``, ``shrunk``, ``connects``,
+        ``transaction_retries`` and ``transaction_failures``. With the
+        compressed protocol also bytes of all connections, including
+        closed ones, see :attr:`AsyncMySQLConnection.traffic`, and
+        ``bytes_saved`` by compression.
+
+        :rtype: dict
+        """
+        stats = dict(self._stats)
+        traffic = Counter(self._closed_traffic)
+        for cnx in list(self._pool):
+            # a copy, the counter is updated in the executor of cnx
+            traffic.update(dict(cnx.traffic))
+        stats.update(+traffic)  # without counters of no traffic
+        if 'payload_received' in stats:
+            stats['bytes_saved'] = (
+                stats['payload_received'] + stats['payload_sent'] -
+                stats['bytes_received'] - stats['bytes_sent']
+            )
+        return stats
+
+    @property
+    def statement_stats(self):
+        """Statistics of statements passed as `statement_stats`, ``None``
+        when they are not collected
+
+        :rtype: StatementStats
+        """
+        return self._statement_stats
+
+    def resize(self, size):
+        """Changes the size of the pool. Waiters are served by new
+        connections when the pool grows, free connections above the size
+        are closed when it shrinks, busy ones when they are released.
+
+        :param int size: new size
+        :raise ValueError: if the `size` is inappropriate
+        """
+        if size < 1:
+            raise ValueError('DBPool.size is less than 1')
+        self._size = size
+        if len(self) < size:
+            self._grow()
+        else:
+            excess = len(self) - size
+            for cnx in list(self._pool - self._busy_items)[:excess]:
+                self._discard(cnx)
+
+    def _remove(self, cnx):
+        """Removes `cnx` from the pool keeping its traffic in the stats"""
+        self._pool.discard(cnx)
+        self._closed_traffic.update(dict(cnx.traffic))
+        for key in [k for k, c in self._last_used.items() if c is cnx]:
+            del self._last_used[key]
+
+    def _discard(self, cnx):
+        self._remove(cnx)
+        self._loop.create_task(cnx.disconnect())
+
+    def _grow(self):
+        """Opens connections for waiters while the pool is below its size"""
+        for waiter in list(self._pending_futures):
+            if len(self) >= self.size:
+                break
+            future, key = waiter
+            if future.done():
+                continue
+            admission = self._key_admission(key)
+            if admission is None:
+                continue
+            self._pending_futures.remove(waiter)
+            cnx = self._create_connection()
+            self._pool.add(cnx)
+            self._issue(cnx, key, admission)
+            self._loop.create_task(self._connect_for(cnx, future))
+
+    def _create_connection(self):
+        return AsyncMySQLConnection(loop=self._loop,
+                                    statement_stats=self._statement_stats)
+
+    @asyncio.coroutine
+    def _open(self, cnx):
+        """Connects `cnx` within the connect limits of the pool"""
+        if self._connect_semaphore is not None:
+            yield from self._connect_semaphore.acquire()
+        try:
+            if self._connect_rate:
+                # connections are spaced by 1 / connect_rate seconds
+                now = self._loop.time()
+                start = max(now, self._next_connect)
+                self._next_connect = start + 1.0 / self._connect_rate
+                if start > now:
+                    yield from asyncio.sleep(start - now, loop=self._loop)
+
+            config = self.config
+            self._stats['connects'] += 1
+            if self._dns_cache is not None:
+                address = yield from self._dns_cache.resolve(
+                    config.get('host', '127.0.0.1'), config.get('port', 3306)
+                )
+                yield from cnx._connect_to(address, **config)
+            else:
+                yield from cnx.connect(**config)
+        finally:
+            if self._connect_semaphore is not None:
+                self._connect_semaphore.release()
+
+    @asyncio.coroutine
+    def _connect_for(self, cnx, future):
+        try:
+            yield from self._open(cnx)
+        except Exception as err:
+            self._revoke(cnx)
+            self._remove(cnx)
+            self._busy_items.discard(cnx)
+            if not future.done():
+                future.set_exception(err)
+            return
+
+        if future.done():  # the waiter has timed out meanwhile
+            self._release(cnx)
+        else:
+            future.set_result(cnx)
+
+    @asyncio.coroutine
+    def _adapt(self):
+        """Additive increase, multiplicative decrease of the size driven by
+        time of waiting for connections
+        """
+        checkouts = waits = wait_time = 0
+        last_wait = self._loop.time()
+        while True:
+            yield from asyncio.sleep(self._adapt_interval, loop=self._loop)
+
+            stats = self._stats
+            d_checkouts = stats['checkouts'] - checkouts
+            d_waits = stats['waits'] - waits
+            d_wait_time = stats['wait_time'] - wait_time
+            checkouts, waits = stats['checkouts'], stats['waits']
+            wait_time = stats['wait_time']
+            peak_busy, self._peak_busy = self._peak_busy, \
+                len(self._busy_items)
+
+            # waiters held back by a key limit would not use a new slot
+            queued = sum(
+                1 for future, key in self._pending_futures
+                if not future.done() and self._key_admission(key) is not None
+            )
+            if d_waits or queued:
+                last_wait = self._loop.time()
+            mean_wait = d_wait_time / d_checkouts if d_checkouts else 0.0
+
+            if (queued or mean_wait > self._target_wait) and \
+               self.size < self._max_size:
+                size = min(self._max_size, self.size + max(1, queued))
+                log.info('Pool grows from %d to %d connections, mean wait '
+                         '%.3fs, %d waiting', self.size, size, mean_wait,
+                         queued)
+                self._stats['grown'] += 1
+                self.resize(size)
+            elif self._loop.time() - last_wait >= self._idle_timeout and \
+                    self.size > max(self._min_size, peak_busy):
+                size = max(self._min_size, peak_busy,
+                           self.size - max(1, (self.size - peak_busy) // 2))
+                log.info('Pool shrinks from %d to %d connections',
+                         self.size, size)
+                self._stats['shrunk'] += 1
+                self.resize(size)
+
     def __len__(self):
         """Number of allocated pool's slots
 
@@ -83,17 +356,79 @@ class AsyncConnectionPool:
         """
         return self.size - len(self._busy_items)
 
+    def _key_admission(self, key):
+        """Whether a connection may be issued for `key`: ``'own'`` within
+        the key's limit, ``'overflow'`` above it or ``None``.
+        """
+        if key is None:
+            return 'own'
+        limit = self._key_limits.get(key, self._key_limit)
+        if limit is None or self._key_usage[key] < limit:
+            return 'own'
+        if self._overflow_usage < self._overflow:
+            return 'overflow'
+        return None
+
+    def _issue(self, cnx, key, admission):
+        self._busy_items.add(cnx)
+        self._peak_busy = max(self._peak_busy, len(self._busy_items))
+        if key is None:
+            return
+        self._key_usage[key] += 1
+        overflow = admission == 'overflow'
+        if overflow:
+            self._overflow_usage += 1
+        self._issued[cnx] = (key, overflow)
+        self._last_used[key] = cnx
+
+    def _revoke(self, cnx):
+        try:
+            key, overflow = self._issued.pop(cnx)
+        except KeyError:
+            return
+        self._key_usage[key] -= 1
+        if not self._key_usage[key]:
+            del self._key_usage[key]
+        if overflow:
+            self._overflow_usage -= 1
+            return
+        # an overflow connection of the key takes over the freed own quota
+        for other, (other_key, other_overflow) in self._issued.items():
+            if other_overflow and other_key == key:
+                self._issued[other] = (key, False)
+                self._overflow_usage -= 1
+                break
+
+    def _free_connection(self, key):
+        free = self._pool - self._busy_items
+        if not free:
+            return None
+        if self._sticky:
+            last = self._last_used.get(key)
+            if last in free:
+                return last
+        return next(iter(free))
+
     @asyncio.coroutine
-    def get(self):
+    def get(self, key=None):
         """Coroutine. Returns an opened connection from pool.
         If coroutine invoked when all connections have been issued, then
         caller will blocked until some connection will be released.
 
+        Connections can be issued per `key`, e.g. a tenant of a service.
+        The number of connections simultaneously issued for a key is
+        limited by `key_limit`, `key_limits` and `overflow` of the pool,
+        so that one key can not starve the others. All of them count
+        toward :attr:`size`.
+
         Also, the class provides context manager for getting connection
         and automatically freeing it. Example:
         >>> with (yield from pool) as cnx:
         >>>     ...
+        >>> with (yield from pool.acquire(key='tenant')) as cnx:
+        >>>     ...
 
+        :param key: hashable key the connection is issued for
         :rtype: AsyncMySQLConnection
         :raise: concurrent.futures.TimeoutError()
         """
@@ -101,53 +436,167 @@ class AsyncConnectionPool:
 
         yield from self._shutdown_event.wait()
 
-        for free_client in self._pool - self._busy_items:
-            cnx = free_client
-            self._busy_items.add(cnx)
-            break
-        else:
-            if len(self) < self.size:
-                cnx = AsyncMySQLConnection(loop=self._loop)
+        if self._max_size is not None and self._adapter is None:
+            self._adapter = self._loop.create_task(self._adapt())
+        self._stats['checkouts'] += 1
+
+        admission = self._key_admission(key)
+        if admission is not None:
+            cnx = self._free_connection(key)
+            if cnx is not None:
+                self._issue(cnx, key, admission)
+            elif len(self) < self.size:
+                cnx = self._create_connection()
                 self._pool.add(cnx)
-                self._busy_items.add(cnx)
+                self._issue(cnx, key, admission)
 
                 try:
-                    yield from cnx.connect(**self.config)
+                    yield from self._open(cnx)
                 except:
-                    self._pool.remove(cnx)
+                    self._revoke(cnx)
+                    self._remove(cnx)
                     self._busy_items.remove(cnx)
                     raise
 
         if not cnx:
             queue_future = Future(loop=self._loop)
-            self._pending_futures.append(queue_future)
+            waiter = (queue_future, key)
+            self._pending_futures.append(waiter)
+            start_wait = self._loop.time()
             try:
                 cnx = yield from asyncio.wait_for(queue_future,
                                                   self.queue_timeout,
                                                   loop=self._loop)
-                self._busy_items.add(cnx)
             except TimeoutError:
+                self._stats['timeouts'] += 1
                 raise TimeoutError('Database pool is busy')
             finally:
+                self._stats['waits'] += 1
+                self._stats['wait_time'] += self._loop.time() - start_wait
                 try:
-                    self._pending_futures.remove(queue_future)
+                    self._pending_futures.remove(waiter)
                 except ValueError:
                     pass
 
         return cnx
 
+    @asyncio.coroutine
+    def acquire(self, key=None):
+        """Coroutine. Gets a connection for `key` like :func:`get` and
+        returns a context manager freeing it. Example:
+        >>> with (yield from pool.acquire(key='tenant')) as cnx:
+        >>>     ...
+        """
+        cnx = yield from self.get(key)
+        return ContextManager(self, cnx)
+
     def release(self, connection):
         """Frees connection. After that the connection can be issued
         by :func:`get`.
 
+        A connection with an unread result or an open transaction is
+        cleaned up in the background: the result is discarded and the
+        transaction is rolled back, or the whole session is reset when the
+        pool is created with `reset_session` or a statement of the
+        connection has been killed. The connection is freed
+        afterwards, so :func:`get` always returns a clean connection.
+        A connection whose cleanup fails is closed and replaced by a new
+        one.
+
         :param AsyncMySQLConnection connection: a connection received
             from :func:`get`
         """
-        if len(self._pending_futures):
-            f = self._pending_futures.popleft()
-            f.set_result(connection)
+        if self._reset_session or connection._needs_reset or \
+           connection.unread_result or connection.in_transaction:
+            self._loop.create_task(self._cleanup(connection))
         else:
-            self._busy_items.remove(connection)
+            self._release(connection)
+
+    @asyncio.coroutine
+    def _cleanup(self, connection):
+        try:
+            if self._reset_session or connection._needs_reset:
+                yield from connection.reset_connection()
+            else:
+                yield from connection.discard_results()
+                if connection.in_transaction:
+                    yield from connection.rollback()
+        except Exception as err:
+            log.warning('Cleanup of released connection failed: %r. '
+                        'Disconnecting.', err)
+            try:
+                yield from connection.disconnect()
+            except Exception:
+                pass
+            if connection in self._busy_items:  # the pool was not shut down
+                # dropped, a waiter gets a new connection
+                self._revoke(connection)
+                self._remove(connection)
+                self._busy_items.discard(connection)
+                self._grow()
+            return
+
+        if connection in self._busy_items:  # the pool was not shut down
+            self._release(connection)
+
+    def _release(self, connection):
+        self._revoke(connection)
+        # the first waiter whose key is within its limits takes it over
+        for waiter in list(self._pending_futures):
+            future, key = waiter
+            if future.done():
+                self._pending_futures.remove(waiter)
+                continue
+            admission = self._key_admission(key)
+            if admission is None:
+                continue
+            self._pending_futures.remove(waiter)
+            self._issue(connection, key, admission)
+            future.set_result(connection)
+            return
+        self._busy_items.remove(connection)
+        if len(self) > self.size:  # the pool has shrunk
+            self._discard(connection)
+
+    @asyncio.coroutine
+    def run_in_transaction(self, fn, *args, key=None, retries=3,
+                           backoff=0.05, max_backoff=1.0, **kwargs):
+        """Coroutine. Gets a connection for `key` and runs
+        ``fn(cnx, *args)`` in a transaction on it, repeating the
+        transaction on deadlocks and lock wait timeouts. Repetitions are
+        counted in :attr:`stats`. See
+        :meth:`AsyncMySQLConnection.run_in_transaction`.
+
+        :return: result of `fn`
+        """
+        with (yield from self.acquire(key)) as cnx:
+            return (
+                yield from run_in_transaction(
+                    cnx, fn, *args, retries=retries, backoff=backoff,
+                    max_backoff=max_backoff, stats=self._stats,
+                    loop=self._loop, **kwargs
+                )
+            )
+
+    def scan(self, table, key_columns, **kwargs):
+        """Returns a :class:`KeysetScan` reading `table` in pages ordered by
+        `key_columns`. Each page is read on a connection got from the pool.
+        Keyword arguments are passed to :class:`KeysetScan`, e.g.
+        ``prefetch=True`` reads the next page on a second connection while
+        the current one is consumed.
+
+        :rtype: KeysetScan
+        """
+        return KeysetScan(self, table, key_columns, loop=self._loop, **kwargs)
+
+    def write_behind(self, **kwargs):
+        """Returns a :class:`WriteBehindQueue` writing rows enqueued one
+        at a time in batches on connections of the pool. Keyword arguments
+        are passed to :class:`WriteBehindQueue`.
+
+        :rtype: WriteBehindQueue
+        """
+        return WriteBehindQueue(self, loop=self._loop, **kwargs)
 
     @asyncio.coroutine
     def shutdown(self):
@@ -155,16 +604,26 @@ class AsyncConnectionPool:
         for connection.
         """
         self._shutdown_event.clear()
+        if self._adapter is not None:
+            self._adapter.cancel()
+            self._adapter = None
         try:
-            for cnx in self._pool:
+            for cnx in list(self._pool):
                 yield from cnx.disconnect()
+                self._remove(cnx)
 
-            for f in self._pending_futures:
+            for f, _ in self._pending_futures:
                 f.cancel()
 
             self._pending_futures.clear()
             self._pool = set()
             self._busy_items = set()
+            self._key_usage.clear()
+            self._overflow_usage = 0
+            self._issued.clear()
+            self._last_used.clear()
+            if self._dns_cache is not None:
+                self._dns_cache.clear()
         finally:
             self._shutdown_event.set()
 
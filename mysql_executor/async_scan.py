@@ -0,0 +1,199 @@
+"""
+.. module:: async_scan
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import asyncio
+
+from .utils import quote_identifier, select_statement
+
+__all__ = ['KeysetScan']
+
+
+class KeysetScan:
+    """Pages through a table in key order without ``LIMIT/OFFSET``.
+
+    Every page is read with ``WHERE (key) > (last key) ORDER BY key
+    LIMIT batch_size``, so the cost of a page does not depend on how deep
+    into the table the scan is and the whole scan stays linear.
+
+    Rows are consumed page by page:
+    >>> scan = pool.scan('orders', ('id',), batch_size=500)
+    >>> while True:
+    >>>     rows = yield from scan.fetch_page()
+    >>>     if not rows:
+    >>>         break
+
+    or row by row with ``async for row in scan`` (Python 3.5+).
+
+    :param source: :class:`AsyncConnectionPool` or
+        :class:`AsyncMySQLConnection` the pages are read from
+    :param str table: table name, may be qualified with the database
+    :param key_columns: names of the columns of a unique key; pages
+        are ordered by them
+    :param columns: names of the selected columns, all columns by default.
+        Key columns must be among them.
+    :param str where: additional filter, may contain ``%s`` markers
+    :param tuple params: parameters for markers of `where`
+    :param int batch_size: number of rows in a page
+    :param tuple start_after: key to resume from, see :attr:`last_key`
+    :param bool prefetch: read the next page on another connection of
+        the pool while the current one is consumed
+    :raise ValueError: if arguments are inappropriate
+    """
+    def __init__(self, source, table, key_columns, *, columns=None,
+                 where=None, params=(), batch_size=1000, start_after=None,
+                 prefetch=False, loop=None):
+        if isinstance(key_columns, str):
+            key_columns = (key_columns,)
+        if not key_columns:
+            raise ValueError('At least one key column expected')
+        if batch_size < 1:
+            raise ValueError('batch_size is less than 1')
+        pooled = hasattr(source, 'get') and hasattr(source, 'release')
+        if prefetch and not pooled:
+            raise ValueError('Prefetching requires a connection pool')
+        if start_after is not None:
+            start_after = tuple(start_after)
+            if len(start_after) != len(key_columns):
+                raise ValueError('start_after does not match key_columns')
+
+        self._source = source
+        self._pooled = pooled
+        self._key_columns = tuple(key_columns)
+        self._columns = tuple(columns) if columns else None
+        self._table = table
+        self._where = where
+        self._params = tuple(params)
+        self._batch_size = batch_size
+        self._prefetch = prefetch
+        self._loop = loop or asyncio.get_event_loop()
+
+        self._last_key = start_after
+        self._key_indexes = None
+        self._next_page = None
+        self._rows = None
+        self._exhausted = False
+
+    @property
+    def last_key(self):
+        """Key of the last row returned, ``None`` before the first page.
+        Pass it as ``start_after`` to resume an interrupted scan.
+
+        :rtype: tuple
+        """
+        return self._last_key
+
+    @property
+    def exhausted(self):
+        """Whether all pages have been read
+
+        :rtype: bool
+        """
+        return self._exhausted
+
+    def _statement(self, after_key):
+        keys = [quote_identifier(c) for c in self._key_columns]
+
+        conditions = []
+        if after_key is not None:
+            # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ..., equivalent of
+            # the row constructor (k1, k2) > (v1, v2) usable by any
+            # server's range optimizer
+            alternatives = []
+            params = []
+            for i, key in enumerate(keys):
+                terms = ['%s = %%s' % k for k in keys[:i]]
+                terms.append('%s > %%s' % key)
+                alternatives.append('(%s)' % ' AND '.join(terms))
+                params.extend(after_key[:i + 1])
+            conditions.append(('(%s)' % ' OR '.join(alternatives), params))
+
+        stmt, params = select_statement(self._table, self._columns,
+                                        self._where, self._params,
+                                        conditions)
+        stmt += ' ORDER BY %s LIMIT %d' % (', '.join(keys), self._batch_size)
+        return stmt, params
+
+    @asyncio.coroutine
+    def _read_page(self, cnx, after_key):
+        stmt, params = self._statement(after_key)
+        cursor = yield from cnx.async_cursor()
+        try:
+            yield from cursor.execute(stmt, params)
+            rows = yield from cursor.fetchall()
+            if self._key_indexes is None:
+                names = cursor.column_names
+                try:
+                    self._key_indexes = tuple(
+                        names.index(c) for c in self._key_columns
+                    )
+                except ValueError:
+                    raise ValueError('Key columns must be selected')
+        finally:
+            cursor.close()
+        return rows
+
+    @asyncio.coroutine
+    def _fetch(self, after_key):
+        if not self._pooled:
+            return (yield from self._read_page(self._source, after_key))
+
+        cnx = yield from self._source.get()
+        try:
+            return (yield from self._read_page(cnx, after_key))
+        finally:
+            self._source.release(cnx)
+
+    def _key_of(self, row):
+        return tuple(row[i] for i in self._key_indexes)
+
+    @asyncio.coroutine
+    def fetch_page(self):
+        """Coroutine. Returns the next page of rows, an empty list when
+        the table has been scanned to its end.
+
+        :rtype: list
+        """
+        if self._exhausted:
+            return []
+
+        if self._next_page is not None:
+            page, self._next_page = self._next_page, None
+            rows = yield from page
+        else:
+            rows = yield from self._fetch(self._last_key)
+
+        if len(rows) < self._batch_size:
+            self._exhausted = True
+        if rows:
+            self._last_key = self._key_of(rows[-1])
+            if self._prefetch and not self._exhausted:
+                self._next_page = self._loop.create_task(
+                    self._fetch(self._last_key)
+                )
+        return rows
+
+    @asyncio.coroutine
+    def close(self):
+        """Coroutine. Stops the scan and waits for a prefetched page
+        """
+        self._exhausted = True
+        page, self._next_page = self._next_page, None
+        if page is not None:
+            try:
+                yield from page
+            except Exception:
+                pass
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        while not self._rows:
+            self._rows = yield from self.fetch_page()
+            if not self._rows:
+                raise StopAsyncIteration
+            self._rows.reverse()
+        return self._rows.pop()
@@ -0,0 +1,173 @@
+"""
+.. module:: async_spooled_cursor
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import asyncio
+
+from mysql.connector import errors
+
+from .async_cursor import AsyncMySQLCursor
+from .conversion import apply_decoders
+from .spool import RowSpool
+
+__all__ = ['AsyncMySQLSpooledCursor']
+
+
+class AsyncMySQLSpooledCursor(AsyncMySQLCursor):
+    """Buffered cursor with a memory ceiling.
+
+    :meth:`execute` reads the whole result like a buffered cursor, but
+    keeps at most about `max_buffer_size` bytes of rows in memory. Further
+    rows are spilled to a temporary file in a compact binary format and
+    read back through a memory map, see :class:`spool.RowSpool`. Rows are
+    stored raw and converted to Python types when fetched, see
+    :func:`conversion.column_decoders`.
+
+    :attr:`rowcount` is known after :meth:`execute`, and :meth:`scroll`
+    moves to any row before fetching.
+
+    `base_cursor` has to be an unbuffered raw cursor.
+
+    :param int max_buffer_size: approximate bytes of rows held in memory
+    :param str spool_dir: directory of temporary files
+    """
+    def __init__(self, base_cursor, executor, *, max_buffer_size,
+                 spool_dir=None, converters=None, **kwargs):
+        super().__init__(base_cursor, executor,
+                         converters={} if converters is None else converters,
+                         **kwargs)
+        self._max_buffer_size = max_buffer_size
+        self._spool_dir = spool_dir
+        self._spool = None
+        self._position = 0
+
+    @property
+    def spilled(self):
+        """Number of rows of the result spilled to the file
+
+        :rtype: int
+        """
+        return self._spool.spilled if self._spool is not None else 0
+
+    def _close_spool(self):
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        self._position = 0
+
+    def _execute_spooled(self, operation, params):
+        self._close_spool()
+        self._cursor.execute(operation, params)
+        if not self._cursor.description:
+            return
+
+        spool = RowSpool(self._max_buffer_size, dir=self._spool_dir)
+        try:
+            while True:
+                rows = self._cursor.fetchmany(1000)
+                if not rows:
+                    break
+                spool.extend(rows)
+            spool.seal()
+        except:
+            spool.close()
+            raise
+        self._spool = spool
+
+    @asyncio.coroutine
+    def execute(self, operation, params=(), multi=False, timeout=None):
+        """Coroutine. Executes the given operation and reads its result
+        to memory and to the spool file, see
+        :meth:`AsyncMySQLCursor.execute`.
+
+        :raise ValueError: if `multi` is set
+        """
+        if multi:
+            raise ValueError('multi is not available with max_buffer_size')
+        yield from self._execute_recorded(
+            operation, timeout, self._execute_spooled,
+            self._add_max_execution_time(operation, timeout), params
+        )
+
+    def _fetch(self, count):
+        if self._spool is None:
+            raise errors.InterfaceError('No result set to fetch from.')
+        rows = self._spool.rows(self._position, self._position + count)
+        self._position += len(rows)
+        return apply_decoders(rows, self._column_decoders())
+
+    @asyncio.coroutine
+    def fetchone(self):
+        """Coroutine. Returns next row of a query result set
+
+        Returns a tuple or None.
+        """
+        rows = yield from self._run_in_executor(self._fetch, 1)
+        self._count_rows(len(rows))
+        return rows[0] if rows else None
+
+    @asyncio.coroutine
+    def fetchmany(self, size=1):
+        """Coroutine. Returns the next set of rows of a query result,
+        returning a list of tuples. When no more rows are available,
+        it returns an empty list.
+        """
+        rows = yield from self._run_in_executor(self._fetch, size)
+        self._count_rows(len(rows))
+        return rows
+
+    @asyncio.coroutine
+    def fetchall(self):
+        """Coroutine. Returns all remaining rows of a query result set
+
+        Returns a list of tuples.
+        """
+        rows = yield from self._run_in_executor(self._fetch, self.rowcount)
+        self._count_rows(len(rows))
+        return rows
+
+    def scroll(self, value, mode='relative'):
+        """Moves the position in the result set by `value` rows, or to
+        row `value` when `mode` is ``'absolute'``
+
+        :raise IndexError: if the position is out of the result set
+        """
+        if self._spool is None:
+            raise errors.InterfaceError('No result set to scroll.')
+        if mode == 'relative':
+            position = self._position + value
+        elif mode == 'absolute':
+            position = value
+        else:
+            raise errors.ProgrammingError('Unknown scroll mode %r' % mode)
+        if not 0 <= position <= len(self._spool):
+            raise IndexError('Position %d is out of the result set'
+                             % position)
+        self._position = position
+
+    @property
+    def rownumber(self):
+        """Index of the next row to fetch
+
+        :rtype: int
+        """
+        return self._position
+
+    @property
+    def rowcount(self):
+        """Returns the number of rows produced or affected, all rows of
+        the result set are counted after execution
+        """
+        if self._spool is not None:
+            return len(self._spool)
+        return self._cursor.rowcount
+
+    def close(self):
+        """Close the cursor and remove the spool file"""
+        self._close_spool()
+        super().close()
+
+    def _close(self):
+        self._close_spool()
+        return super()._close()
@@ -0,0 +1,190 @@
+"""
+.. module:: async_transaction
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import asyncio
+import random
+
+from mysql.connector import errors, errorcode
+
+from .utils import log
+
+__all__ = ['Transaction', 'run_in_transaction', 'RETRYABLE_ERRORS']
+
+#: errors after which the whole transaction may succeed when repeated
+RETRYABLE_ERRORS = (
+    errorcode.ER_LOCK_DEADLOCK,  # 1213
+    errorcode.ER_LOCK_WAIT_TIMEOUT,  # 1205
+)
+
+
+class Transaction:
+    """Asynchronous context manager of a transaction, committed when the
+    block succeeds and rolled back when it raises (Python 3.5+):
+    >>> async with cnx.transaction(isolation_level='SERIALIZABLE'):
+    >>>     ...
+
+    A transaction begun inside of another one of the same connection is
+    nested: it is implemented with ``SAVEPOINT``, so its rollback discards
+    only the work done inside of it and the outer transaction goes on:
+    >>> async with cnx.transaction():
+    >>>     for chunk in chunks:
+    >>>         try:
+    >>>             async with cnx.transaction():
+    >>>                 ...
+    >>>         except errors.DatabaseError:
+    >>>             pass  # the chunk is skipped
+
+    A transaction implicitly started by earlier statements, when
+    autocommit is off, is committed before the outermost transaction
+    begins, like the server does on ``START TRANSACTION``.
+
+    Use :func:`run_in_transaction` to repeat the transaction on deadlocks.
+
+    :param AsyncMySQLConnection cnx: connection
+    :param kwargs: arguments of
+        :meth:`AsyncMySQLConnection.start_transaction`
+    """
+    def __init__(self, cnx, **kwargs):
+        self._cnx = cnx
+        self._kwargs = kwargs
+        self._savepoint = None
+        self._active = False
+
+    @property
+    def nested(self):
+        """Whether the transaction is a savepoint of an outer one
+
+        :rtype: bool
+        """
+        return self._savepoint is not None
+
+    @asyncio.coroutine
+    def begin(self):
+        """Coroutine. Starts the transaction, sets a savepoint when
+        another transaction of the connection is in progress
+        """
+        cnx = self._cnx
+        if cnx._transaction_depth:
+            self._savepoint = cnx._next_savepoint_name()
+            yield from cnx.savepoint(self._savepoint)
+        else:
+            self._savepoint = None
+            if cnx.in_transaction:  # started implicitly, autocommit is off
+                yield from cnx.commit()
+            yield from cnx.start_transaction(**self._kwargs)
+        cnx._transaction_depth += 1
+        self._active = True
+
+    def _end(self):
+        if self._active:
+            self._active = False
+            self._cnx._transaction_depth -= 1
+
+    @asyncio.coroutine
+    def commit(self):
+        """Coroutine. Commits the transaction, releases the savepoint of
+        a nested one
+        """
+        try:
+            if self._savepoint is not None:
+                yield from self._cnx.release_savepoint(self._savepoint)
+            else:
+                yield from self._cnx.commit()
+        finally:
+            self._end()
+
+    @asyncio.coroutine
+    def rollback(self):
+        """Coroutine. Rolls the transaction back, rolls back to the
+        savepoint and releases it for a nested one
+        """
+        try:
+            if self._savepoint is not None:
+                yield from self._cnx.rollback_to_savepoint(self._savepoint)
+                yield from self._cnx.release_savepoint(self._savepoint)
+            else:
+                yield from self._cnx.rollback()
+        finally:
+            self._end()
+
+    @asyncio.coroutine
+    def __aenter__(self):
+        yield from self.begin()
+        return self._cnx
+
+    @asyncio.coroutine
+    def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            yield from self.commit()
+        else:
+            yield from _rollback_quietly(self)
+
+
+@asyncio.coroutine
+def _rollback_quietly(transaction):
+    try:
+        yield from transaction.rollback()
+    except Exception as err:
+        log.warning('Rollback failed: %r', err)
+
+
+@asyncio.coroutine
+def run_in_transaction(cnx, fn, *args, retries=3, backoff=0.05,
+                       max_backoff=1.0, stats=None, loop=None, **kwargs):
+    """Coroutine. Runs ``fn(cnx, *args)`` in a transaction and commits it.
+
+    When the transaction fails with a deadlock or a lock wait timeout, it
+    is rolled back and the whole unit of work is repeated up to `retries`
+    times after a random delay of exponentially growing upper bound.
+
+    Inside of another :class:`Transaction` of the connection, the unit of
+    work runs in a nested transaction (savepoint) and is not repeated, since
+    a deadlock rolls back the outer transaction as well.
+
+    :param AsyncMySQLConnection cnx: connection
+    :param fn: coroutine function doing the unit of work
+    :param int retries: maximal number of repetitions
+    :param float backoff: upper bound of the delay before the first
+        repetition, doubled for each following one
+    :param float max_backoff: upper bound of any delay
+    :param stats: :class:`collections.Counter` where
+        ``transaction_retries`` and ``transaction_failures`` (transactions
+        which still failed after all repetitions) are counted
+    :param kwargs: arguments of
+        :meth:`AsyncMySQLConnection.start_transaction`
+    :return: result of `fn`
+    """
+    loop = loop or asyncio.get_event_loop()
+    transaction = Transaction(cnx, **kwargs)
+    if cnx._transaction_depth:
+        retries = 0
+    attempt = 0
+    while True:
+        yield from transaction.begin()
+        try:
+            result = yield from fn(cnx, *args)
+            yield from transaction.commit()
+            return result
+        except errors.DatabaseError as err:
+            yield from _rollback_quietly(transaction)
+            if err.errno not in RETRYABLE_ERRORS:
+                raise
+            if attempt >= retries:
+                if stats is not None:
+                    stats['transaction_failures'] += 1
+                raise
+
+            attempt += 1
+            if stats is not None:
+                stats['transaction_retries'] += 1
+            delay = random.uniform(
+                0, min(max_backoff, backoff * 2 ** (attempt - 1))
+            )
+            log.info('Transaction failed: %r. Retry #%d in %.3fs.',
+                     err, attempt, delay)
+            yield from asyncio.sleep(delay, loop=loop)
+        except:
+            yield from _rollback_quietly(transaction)
+            raise
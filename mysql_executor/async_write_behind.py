@@ -0,0 +1,163 @@
+"""
+.. module:: async_write_behind
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import asyncio
+from asyncio import Future, Semaphore
+from collections import Counter
+
+from .utils import log
+
+__all__ = ['WriteBehindQueue']
+
+
+class WriteBehindQueue:
+    """Coalesces statements enqueued one row at a time into batches
+    written with :meth:`AsyncMySQLCursor.executemany`, which sends
+    ``INSERT ... VALUES`` statements as one multi-row INSERT. Example:
+    >>> queue = pool.write_behind(batch_size=500, flush_interval=0.05)
+    >>> ack = yield from queue.enqueue(
+    >>>     'INSERT INTO events (kind, payload) VALUES (%s, %s)',
+    >>>     ('click', '{}'))
+    >>> ...
+    >>> yield from ack  # the row is committed
+    >>> yield from queue.close()
+
+    Rows of a statement are written when `batch_size` of them are
+    enqueued or `flush_interval` seconds after the first of them. Every
+    batch is written and committed on a connection got from the pool, so
+    batches of different statements, and of the same statement when the
+    pool has several connections, may be committed out of order.
+
+    At most `max_pending` rows are held in memory: :meth:`enqueue` waits
+    until earlier rows are written when the limit is reached.
+
+    :param AsyncConnectionPool pool: pool of connections
+    :param int batch_size: maximal number of rows of a batch
+    :param float flush_interval: maximal seconds a row waits for its batch
+    :param int max_pending: maximal number of enqueued rows not written
+        yet
+    :param key: key of :meth:`AsyncConnectionPool.get` connections are
+        got for
+    :param loop: event loop, if not passed then default will be used
+    """
+    def __init__(self, pool, *, batch_size=500, flush_interval=0.05,
+                 max_pending=10000, key=None, loop=None):
+        if batch_size < 1 or max_pending < batch_size:
+            raise ValueError('WriteBehindQueue requires '
+                             '1 <= batch_size <= max_pending')
+        self._pool = pool
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._key = key
+        self._loop = loop or asyncio.get_event_loop()
+        self._slots = Semaphore(max_pending, loop=self._loop)
+        self._batches = {}  # operation -> list of (params, future)
+        self._timers = {}  # operation -> timer flushing its batch
+        self._writes = set()
+        self._writing = 0  # rows of batches being written
+        self._closed = False
+        #: numbers of ``rows`` and ``batches`` written and of
+        #: ``failed_rows``
+        self.stats = Counter()
+
+    @property
+    def pending(self):
+        """Number of enqueued rows not written yet
+
+        :rtype: int
+        """
+        return sum(map(len, self._batches.values())) + self._writing
+
+    @asyncio.coroutine
+    def enqueue(self, operation, params=()):
+        """Coroutine. Enqueues a row, waits while `max_pending` rows are
+        pending.
+
+        :param str operation: statement, e.g.
+            ``INSERT INTO t (a, b) VALUES (%s, %s)``
+        :param params: parameters of the statement for the row
+        :return: future done when the row is committed, or failed with
+            the error of its batch
+        :rtype: asyncio.Future
+        :raise RuntimeError: if the queue is closed, also while waiting
+        """
+        if self._closed:
+            raise RuntimeError('WriteBehindQueue is closed')
+        yield from self._slots.acquire()
+        if self._closed:  # closed while waiting for a slot
+            self._slots.release()
+            raise RuntimeError('WriteBehindQueue is closed')
+
+        future = Future(loop=self._loop)
+        batch = self._batches.setdefault(operation, [])
+        batch.append((params, future))
+        if len(batch) >= self._batch_size:
+            self._flush_batch(operation)
+        elif operation not in self._timers:
+            self._timers[operation] = self._loop.call_later(
+                self._flush_interval, self._flush_batch, operation
+            )
+        return future
+
+    def _flush_batch(self, operation):
+        timer = self._timers.pop(operation, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._batches.pop(operation, None)
+        if not batch:
+            return
+        self._writing += len(batch)
+        task = self._loop.create_task(self._write(operation, batch))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    @asyncio.coroutine
+    def _write(self, operation, batch):
+        try:
+            with (yield from self._pool.acquire(self._key)) as cnx:
+                cursor = yield from cnx.async_cursor()
+                yield from cursor.executemany(operation,
+                                              [row for row, _ in batch])
+                yield from cnx.commit()
+        except Exception as err:
+            log.warning('Write of %d rows failed: %r', len(batch), err)
+            self.stats['failed_rows'] += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+        else:
+            self.stats['rows'] += len(batch)
+            self.stats['batches'] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+        finally:
+            self._writing -= len(batch)
+            for _, future in batch:
+                if not future.done():  # the write was cancelled
+                    future.cancel()
+                self._slots.release()
+
+    @asyncio.coroutine
+    def flush(self):
+        """Coroutine. Writes all enqueued rows and waits for them"""
+        for operation in list(self._batches):
+            self._flush_batch(operation)
+        if self._writes:
+            yield from asyncio.wait(list(self._writes), loop=self._loop)
+
+    @asyncio.coroutine
+    def close(self):
+        """Coroutine. Stops accepting rows and writes the enqueued ones"""
+        self._closed = True
+        yield from self.flush()
+
+    @asyncio.coroutine
+    def __aenter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __aexit__(self, *args):
+        yield from self.close()
@@ -0,0 +1,176 @@
+"""
+.. module:: conversion
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Conversion of raw (undecoded) rows to Python types outside of the cursor.
+Functions are module level, so they can be sent to a
+:class:`concurrent.futures.ProcessPoolExecutor`.
+
+:class:`MySQLConverter` looks up the converter of every value by its field
+type. :func:`column_decoders` does the lookup once per result set and
+:func:`apply_decoders` converts rows column by column.
+"""
+
+import datetime
+from decimal import Decimal
+from operator import methodcaller
+
+from mysql.connector.constants import FieldFlag, FieldType
+from mysql.connector.conversion import MySQLConverter
+
+__all__ = ['decode_rows', 'column_decoders', 'apply_decoders']
+
+_INTEGERS = frozenset((FieldType.TINY, FieldType.SHORT, FieldType.INT24,
+                       FieldType.LONG, FieldType.LONGLONG, FieldType.YEAR))
+_FLOATS = frozenset((FieldType.FLOAT, FieldType.DOUBLE))
+_DECIMALS = frozenset((FieldType.DECIMAL, FieldType.NEWDECIMAL))
+_STRINGS = frozenset((FieldType.STRING, FieldType.VAR_STRING))
+_BLOBS = frozenset((FieldType.TINY_BLOB, FieldType.MEDIUM_BLOB,
+                    FieldType.LONG_BLOB, FieldType.BLOB))
+
+_converters = {}
+
+
+def _converter(charset, use_unicode):
+    key = (charset, use_unicode)
+    try:
+        return _converters[key]
+    except KeyError:
+        converter = _converters[key] = MySQLConverter(charset, use_unicode)
+        return converter
+
+
+def _date(value):
+    try:
+        return datetime.date(int(value[0:4]), int(value[5:7]),
+                             int(value[8:10]))
+    except ValueError:  # zero or invalid dates as MySQLConverter does
+        return None
+
+
+def _datetime(value):
+    try:
+        return datetime.datetime(
+            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+            int(value[11:13]), int(value[14:16]), int(value[17:19]),
+            int(value[20:26].ljust(6, b'0')) if len(value) > 20 else 0
+        )
+    except ValueError:
+        return None
+
+
+def _unknown(value):
+    # the same as MySQLConverter does for types it has no method for
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return value
+
+
+def _decoder(column, converter):
+    """Returns the function converting values of `column`, ``None`` when
+    they are returned as is
+    """
+    field_type, flags = column[1], column[7]
+    if field_type in _INTEGERS:
+        return int
+    if field_type in _FLOATS:
+        return float
+    if field_type in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return _datetime
+    if field_type in (FieldType.DATE, FieldType.NEWDATE):
+        return _date
+    if field_type in _DECIMALS:
+        charset = converter.charset
+        return lambda value: Decimal(value.decode(charset))
+    if field_type in _STRINGS or field_type in _BLOBS:
+        if flags & FieldFlag.SET:
+            method = converter._SET_to_python
+            return lambda value: method(value, column)
+        if flags & FieldFlag.BINARY:
+            return bytes if field_type in _BLOBS else None
+        if converter.charset == 'binary' or not converter.use_unicode:
+            return None
+        return methodcaller('decode', converter.charset)
+
+    name = FieldType.get_info(field_type)
+    method = getattr(converter, '_%s_to_python' % name, None) \
+        if name else None
+    if method is None:
+        return _unknown
+    return lambda value: method(value, column)
+
+
+def column_decoders(description, charset='utf8', use_unicode=True,
+                    converters=None):
+    """Returns decoders of the result set columns for
+    :func:`apply_decoders`, built once per result set
+
+    :param list description: description of the result set columns,
+        see :attr:`AsyncMySQLCursor.description`
+    :param str charset: character set of the connection
+    :param bool use_unicode: whether strings are returned as `str`
+    :param dict converters: functions converting raw values (`bytes`) of
+        columns by their names or positions, overriding the default ones,
+        e.g. ``{'amount': methodcaller('decode')}`` keeps DECIMAL values
+        as strings.
+        ``None`` values keep raw values.
+    :return: tuple of ``(function or None, nullable)`` per column
+    """
+    converter = _converter(charset, use_unicode)
+    converters = converters or {}
+    decoders = []
+    for position, column in enumerate(description):
+        if column[0] in converters:
+            decode = converters[column[0]]
+        elif position in converters:
+            decode = converters[position]
+        else:
+            decode = _decoder(column, converter)
+        decoders.append((decode, bool(column[6])))
+    return tuple(decoders)
+
+
+def apply_decoders(rows, decoders):
+    """Converts raw rows with decoders of :func:`column_decoders`
+
+    Conversion goes column by column, so the decoder of a column is
+    looked up once per call, and NOT NULL columns are mapped without
+    checking values for ``None``.
+
+    :param list rows: raw rows
+    :param tuple decoders: decoders of the result set columns
+    :rtype: list
+    """
+    if not rows:
+        return []
+    columns = []
+    for values, (decode, nullable) in zip(zip(*rows), decoders):
+        if decode is None:
+            columns.append(values)
+        elif nullable:
+            columns.append([None if value is None else decode(value)
+                            for value in values])
+        else:
+            columns.append(list(map(decode, values)))
+    return list(zip(*columns))
+
+
+def decode_rows(rows, description, charset='utf8', use_unicode=True,
+                converters=None):
+    """Converts rows fetched by a raw cursor to Python types
+
+    Decoders are built from `description`, so the function can be sent
+    to worker processes along with rows. `converters` have to be picklable
+    then, e.g. functions defined at module level.
+
+    :param list rows: raw rows
+    :param list description: description of the result set columns,
+        see :attr:`AsyncMySQLCursor.description`
+    :param str charset: character set of the connection
+    :param bool use_unicode: whether strings are returned as `str`
+    :param dict converters: see :func:`column_decoders`
+    :rtype: list
+    """
+    return apply_decoders(rows, column_decoders(description, charset,
+                                                use_unicode, converters))
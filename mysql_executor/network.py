@@ -0,0 +1,117 @@
+"""
+.. module:: network
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Socket level helpers of connections.
+"""
+
+import asyncio
+import socket
+
+__all__ = ['CountingSocket', 'count_compressed_traffic', 'DNSCache']
+
+
+class CountingSocket:
+    """Proxy of a socket counting bytes on the wire in `stats`
+
+    :param sock: connected socket
+    :param collections.Counter stats: counter of ``bytes_received`` and
+        ``bytes_sent``
+    """
+    def __init__(self, sock, stats):
+        self._sock = sock
+        self._stats = stats
+
+    def recv(self, size, *args):
+        data = self._sock.recv(size, *args)
+        self._stats['bytes_received'] += len(data)
+        return data
+
+    def send(self, data, *args):
+        sent = self._sock.send(data, *args)
+        self._stats['bytes_sent'] += sent
+        return sent
+
+    def sendall(self, data, *args):
+        self._sock.sendall(data, *args)
+        self._stats['bytes_sent'] += len(data)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+def count_compressed_traffic(mysql_socket, stats):
+    """Counts bytes of a mysql.connector socket using the compressed
+    protocol in `stats`: ``bytes_received`` and ``bytes_sent`` on the
+    wire, ``payload_received`` and ``payload_sent`` before compression.
+
+    :param mysql_socket: :class:`mysql.connector.network.BaseMySQLSocket`
+    :param collections.Counter stats: counter of bytes
+    """
+    mysql_socket.sock = CountingSocket(mysql_socket.sock, stats)
+    recv, send = mysql_socket.recv, mysql_socket.send
+
+    def counted_recv():
+        packet = recv()
+        stats['payload_received'] += len(packet)
+        return packet
+
+    def counted_send(buf, *args, **kwargs):
+        stats['payload_sent'] += len(buf) + 4  # with the packet header
+        return send(buf, *args, **kwargs)
+
+    mysql_socket.recv = counted_recv
+    mysql_socket.send = counted_send
+
+
+class DNSCache:
+    """Caches resolution of host names to addresses for `ttl` seconds.
+
+    Resolution runs with :meth:`loop.getaddrinfo`, concurrent callers
+    share one lookup and failures are not cached.
+
+    :param float ttl: seconds a resolved address is used
+    :param loop: event loop, if not passed then default will be used
+    """
+    def __init__(self, ttl=60.0, *, loop=None):
+        self.ttl = ttl
+        self._loop = loop or asyncio.get_event_loop()
+        self._entries = {}  # (host, port) -> (expiration time, future)
+
+    @asyncio.coroutine
+    def _getaddrinfo(self, host, port):
+        infos = yield from self._loop.getaddrinfo(host, port,
+                                                  type=socket.SOCK_STREAM)
+        return infos[0][4][0]
+
+    @asyncio.coroutine
+    def resolve(self, host, port):
+        """Coroutine. Returns an address of `host`, `host` itself when it
+        is an address already
+
+        :rtype: str
+        """
+        for family in (socket.AF_INET, socket.AF_INET6):
+            try:
+                socket.inet_pton(family, host)
+                return host
+            except (OSError, ValueError):
+                pass
+
+        key = (host, port)
+        now = self._loop.time()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= now:
+            entry = (now + self.ttl,
+                     self._loop.create_task(self._getaddrinfo(host, port)))
+            self._entries[key] = entry
+        try:
+            return (yield from asyncio.shield(entry[1], loop=self._loop))
+        except Exception:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            raise
+
+    def clear(self):
+        """Forgets all resolved addresses"""
+        self._entries.clear()
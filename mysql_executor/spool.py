@@ -0,0 +1,161 @@
+"""
+.. module:: spool
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Storage of raw rows of a result set, in memory up to a limit and in
+a temporary file above it.
+"""
+
+import mmap
+import struct
+import tempfile
+from array import array
+
+__all__ = ['RowSpool']
+
+# approximate memory taken by a row besides its values
+ROW_OVERHEAD = 64
+# bytes of spilled rows buffered before they are written to the file
+WRITE_BUFFER_SIZE = 1 << 20
+
+_NULL = 0xfb
+_SHORT = 0xfc
+_LONG = 0xfe
+
+
+def _encode_row(row, out):
+    """Appends `row` to `out` as length-encoded values, like in the MySQL
+    protocol: lengths below 251 take a byte, ``0xfb`` is NULL, ``0xfc``
+    and ``0xfe`` prefix 2 and 8 bytes long lengths
+    """
+    for value in row:
+        if value is None:
+            out.append(_NULL)
+            continue
+        length = len(value)
+        if length < _NULL:
+            out.append(length)
+        elif length < 1 << 16:
+            out.append(_SHORT)
+            out += struct.pack('<H', length)
+        else:
+            out.append(_LONG)
+            out += struct.pack('<Q', length)
+        out += value
+
+
+class RowSpool:
+    """Rows of a result set for random access, held in memory while they
+    take up to `max_memory` bytes and spilled to a temporary file
+    afterwards. The file is read back through a memory map, so spilled
+    rows cost memory of the page cache only, besides an offset of 8 bytes
+    per row.
+
+    Rows are appended with :meth:`append` or :meth:`extend`, then
+    :meth:`seal` makes them readable with :meth:`rows`.
+
+    :param int max_memory: approximate memory of rows kept in memory
+    :param str dir: directory of the temporary file, see
+        :func:`tempfile.TemporaryFile`
+    """
+    def __init__(self, max_memory, *, dir=None):
+        self._max_memory = max_memory
+        self._dir = dir
+        self._memory = 0
+        self._rows = []
+        self._columns = 0
+        self._file = None
+        self._buffer = bytearray()
+        self._written = 0
+        self._offsets = array('Q')
+        self._mmap = None
+
+    def __len__(self):
+        return len(self._rows) + len(self._offsets)
+
+    @property
+    def spilled(self):
+        """Number of rows stored in the file
+
+        :rtype: int
+        """
+        return len(self._offsets)
+
+    def append(self, row):
+        """Appends a raw row, a sequence of bytes values or ``None``"""
+        if self._file is None:
+            size = ROW_OVERHEAD + sum(len(value) for value in row
+                                      if value is not None)
+            if self._memory + size <= self._max_memory:
+                self._rows.append(row)
+                self._memory += size
+                return
+            self._columns = len(row)
+            self._file = tempfile.TemporaryFile(dir=self._dir)
+
+        self._offsets.append(self._written + len(self._buffer))
+        _encode_row(row, self._buffer)
+        if len(self._buffer) >= WRITE_BUFFER_SIZE:
+            self._flush()
+
+    def extend(self, rows):
+        """Appends raw rows"""
+        for row in rows:
+            self.append(row)
+
+    def _flush(self):
+        self._file.write(self._buffer)
+        self._written += len(self._buffer)
+        del self._buffer[:]
+
+    def seal(self):
+        """Finishes appending, maps spilled rows to memory"""
+        if self._file is not None:
+            if self._buffer:
+                self._flush()
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+
+    def _read_row(self, offset):
+        data = self._mmap
+        position = offset
+        row = []
+        for _ in range(self._columns):
+            length = data[position]
+            position += 1
+            if length == _NULL:
+                row.append(None)
+                continue
+            if length == _SHORT:
+                length = struct.unpack_from('<H', data, position)[0]
+                position += 2
+            elif length == _LONG:
+                length = struct.unpack_from('<Q', data, position)[0]
+                position += 8
+            row.append(data[position:position + length])
+            position += length
+        return tuple(row)
+
+    def rows(self, start, stop):
+        """Returns raw rows from `start` up to `stop`, not including it
+
+        :rtype: list
+        """
+        stop = min(stop, len(self))
+        in_memory = len(self._rows)
+        rows = self._rows[start:min(stop, in_memory)]
+        for index in range(max(start, in_memory), stop):
+            rows.append(self._read_row(self._offsets[index - in_memory]))
+        return rows
+
+    def close(self):
+        """Releases memory and removes the file"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._rows = []
+        self._offsets = array('Q')
@@ -0,0 +1,184 @@
+"""
+.. module:: statements
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Client side statistics of statements per fingerprint, like the statement
+digests of performance_schema.
+"""
+
+import math
+import re
+
+__all__ = ['StatementStats', 'fingerprint']
+
+_COMMENTS = re.compile(r'/\*.*?\*/|(?:--\s|#)[^\n]*', re.S)
+_LITERALS = re.compile(
+    r"'(?:[^'\\]|\\.|'')*'"  # strings
+    r'|"(?:[^"\\]|\\.|"")*"'
+    r'|\b0x[0-9a-f]+\b'  # hexadecimal numbers
+    r'|(?<![\w.])[-+]?\d+(?:\.\d*)?(?:e[-+]?\d+)?\b'  # numbers
+    r'|%\(\w+\)s|%s',  # parameters
+    re.I
+)
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACES = re.compile(r'\s+')
+
+_fingerprints = {}
+_FINGERPRINTS_CACHED = 10000
+
+
+def fingerprint(operation):
+    """Returns the normalized form of a statement: comments are removed,
+    literals and parameters are replaced with ``?``, lists of values with
+    ``(...)`` and whitespace is collapsed, e.g.
+    ``SELECT * FROM t WHERE id IN (?)`` for
+    ``SELECT * FROM t WHERE id IN (1, 2, 3)``
+
+    :param str operation: statement
+    :rtype: str
+    """
+    try:
+        return _fingerprints[operation]
+    except KeyError:
+        pass
+
+    text = operation.decode('utf-8', 'replace') \
+        if isinstance(operation, (bytes, bytearray)) else operation
+    text = _COMMENTS.sub(' ', text)
+    text = _LITERALS.sub('?', text)
+    text = _LISTS.sub('(...)', text)
+    text = _ROWS.sub('(...)', text)
+    text = _SPACES.sub(' ', text).strip()
+
+    if len(_fingerprints) >= _FINGERPRINTS_CACHED:
+        _fingerprints.clear()
+    _fingerprints[operation] = text
+    return text
+
+
+class _Statement:
+    __slots__ = ('fingerprint', 'calls', 'errors', 'total_time', 'max_time',
+                 'rows_returned', 'rows_affected', 'buckets')
+
+    def __init__(self, fingerprint, buckets):
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.rows_returned = 0
+        self.rows_affected = 0
+        self.buckets = [0] * buckets
+
+
+class StatementStats:
+    """Table of statistics per statement fingerprint, see
+    :func:`fingerprint`.
+
+    Latencies are counted in a histogram of logarithmic buckets growing by
+    `growth`, so updates take constant time and memory while percentiles
+    are estimated within that relative error. When the table holds
+    `max_statements` fingerprints, further ones are accounted to the
+    fingerprint ``None``.
+
+    Statistics are collected by cursors of connections and pools created
+    with it, e.g.:
+    >>> stats = StatementStats()
+    >>> pool = AsyncConnectionPool(size=4, statement_stats=stats, ...)
+    >>> ...
+    >>> for row in stats.export()[:10]:
+    >>>     print(row['fingerprint'], row['calls'], row['p99'])
+
+    :param int max_statements: maximal number of fingerprints
+    :param float min_time: upper bound of the first latency bucket, seconds
+    :param float max_time: latency from which the last bucket starts
+    :param float growth: ratio of bounds of neighbouring buckets
+    """
+    def __init__(self, max_statements=1000, *, min_time=1e-5,
+                 max_time=100.0, growth=1.1):
+        self.max_statements = max_statements
+        self._min_time = min_time
+        self._growth = growth
+        self._scale = 1.0 / math.log(growth)
+        self._buckets = int(math.log(max_time / min_time) * self._scale) + 2
+        self._statements = {}
+
+    def _bucket(self, seconds):
+        if seconds <= self._min_time:
+            return 0
+        return min(int(math.log(seconds / self._min_time) * self._scale) + 1,
+                   self._buckets - 1)
+
+    def record(self, operation, seconds, rows_affected=0, error=False):
+        """Accounts an execution of `operation`
+
+        :param str operation: statement
+        :param float seconds: time of the execution
+        :param int rows_affected: number of rows changed by the statement
+        :param bool error: whether the execution failed
+        :return: entry of the fingerprint, its ``rows_returned`` are
+            incremented by the cursor fetching rows
+        """
+        key = fingerprint(operation)
+        statement = self._statements.get(key)
+        if statement is None:
+            if len(self._statements) >= self.max_statements:
+                key = None
+                statement = self._statements.get(key)
+            if statement is None:
+                statement = self._statements[key] = _Statement(
+                    key, self._buckets
+                )
+
+        statement.calls += 1
+        statement.errors += error
+        statement.total_time += seconds
+        if seconds > statement.max_time:
+            statement.max_time = seconds
+        statement.rows_affected += rows_affected
+        statement.buckets[self._bucket(seconds)] += 1
+        return statement
+
+    def _percentile(self, statement, fraction):
+        rank = fraction * sum(statement.buckets)
+        seen = 0
+        for index, count in enumerate(statement.buckets):
+            seen += count
+            if seen >= rank and count:
+                # upper bound of the bucket
+                return min(self._min_time * self._growth ** index,
+                           statement.max_time)
+        return 0.0
+
+    def export(self):
+        """Returns statistics of fingerprints ordered by total time, the
+        most expensive first. Times are in seconds.
+
+        :return: list of dicts with ``fingerprint``, ``calls``,
+            ``errors``, ``total_time``, ``mean_time``, ``p50``, ``p99``,
+            ``max_time``, ``rows_returned`` and ``rows_affected``
+        """
+        result = []
+        for statement in self._statements.values():
+            result.append({
+                'fingerprint': statement.fingerprint,
+                'calls': statement.calls,
+                'errors': statement.errors,
+                'total_time': statement.total_time,
+                'mean_time': statement.total_time / statement.calls,
+                'p50': self._percentile(statement, 0.5),
+                'p99': self._percentile(statement, 0.99),
+                'max_time': statement.max_time,
+                'rows_returned': statement.rows_returned,
+                'rows_affected': statement.rows_affected,
+            })
+        result.sort(key=lambda row: row['total_time'], reverse=True)
+        return result
+
+    def reset(self):
+        """Forgets all statistics"""
+        self._statements.clear()
+
+    def __len__(self):
+        return len(self._statements)
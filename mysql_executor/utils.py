@@ -6,13 +6,36 @@
 from mysql.connector import errors
 from inspect import isgeneratorfunction
 from asyncio import iscoroutine
-from functools import wraps
+from functools import wraps, partial
+from time import monotonic
+import asyncio
 import logging
+import re
+import sys
+import threading
+import traceback
 
 CONNECT_ATTEMPTS = 2
 
 log = logging.getLogger('mysql_executor')
 
+# event loop -> started LoopWatchdog
+_watchdogs = {}
+
+
+def run_in_executor(loop, executor, fn, *args, **kwargs):
+    """Schedules ``fn(*args, **kwargs)`` in `executor`. When a
+    :class:`LoopWatchdog` is started for `loop`, time the call spends in
+    the executor queue is measured.
+
+    :rtype: asyncio.Future
+    """
+    call = partial(fn, *args, **kwargs)
+    watchdog = _watchdogs.get(loop)
+    if watchdog is not None:
+        call = watchdog._timed(call, executor)
+    return loop.run_in_executor(executor, call)
+
 
 def async_reconnectable(method):
     @wraps(method)
@@ -37,6 +60,70 @@ def async_reconnectable(method):
     return outer
 
 
+def quote_identifier(name):
+    """Quotes a (possibly qualified) MySQL identifier with backticks
+
+    For example ``'db.t'`` becomes ``"`db`.`t`"``.
+    """
+    return '.'.join(
+        '`' + part.replace('`', '``') + '`' for part in name.split('.')
+    )
+
+
+def select_statement(table, columns=None, where=None, params=(),
+                     conditions=()):
+    """Builds ``SELECT columns FROM table WHERE ...`` with the conditions
+    joined by ``AND``
+
+    :param str table: table name, may be qualified with the database
+    :param columns: names of the selected columns, all by default, or
+        a select list string used as is
+    :param str where: filter given by the user, may contain ``%s`` markers
+    :param tuple params: parameters for markers of `where`
+    :param conditions: further ``(condition, parameters)`` pairs
+    :return: statement and its parameters
+    :rtype: tuple
+    """
+    if isinstance(columns, str):
+        select = columns
+    elif columns:
+        select = ', '.join(quote_identifier(c) for c in columns)
+    else:
+        select = '*'
+
+    clauses = []
+    stmt_params = []
+    if where:
+        clauses.append('(%s)' % where)
+        stmt_params.extend(params)
+    for condition, condition_params in conditions:
+        clauses.append(condition)
+        stmt_params.extend(condition_params)
+
+    stmt = 'SELECT %s FROM %s' % (select, quote_identifier(table))
+    if clauses:
+        stmt += ' WHERE ' + ' AND '.join(clauses)
+    return stmt, tuple(stmt_params)
+
+
+_SELECT = re.compile(r'^(\s*SELECT)\b(?!\s*/\*\+)', re.I)
+
+
+def add_max_execution_time(operation, timeout):
+    """Adds the ``MAX_EXECUTION_TIME`` optimizer hint to a ``SELECT``
+    statement, other statements are returned unchanged. The hint is
+    supported by MySQL 5.7.8 and later.
+
+    :param str operation: SQL statement
+    :param float timeout: seconds
+    :rtype: str
+    """
+    if not isinstance(operation, str):
+        return operation
+    hint = r'\1 /*+ MAX_EXECUTION_TIME(%d) */' % max(1, int(timeout * 1000))
+    return _SELECT.sub(hint, operation, count=1)
+
+
 class ContextManager:
     def __init__(self, pool, cnx):
         self._pool = pool
@@ -48,4 +135,131 @@ class ContextManager:
     def __exit__(self, *args):
         self._pool.release(self._cnx)
         self._pool = None
-        self._cnx = None
\ No newline at end of file
+        self._cnx = None
+
+
+class LoopWatchdog:
+    """Opt-in detector of event loop stalls and executor queueing.
+
+    A heartbeat scheduled on the loop measures its lag. A sampler thread
+    notices a heartbeat that is late while the loop is still blocked and
+    logs the stack of the loop thread, so the blocking call can be found.
+    Calls scheduled by connections and cursors report the time they waited
+    in the queue of the connection's executor. Violations are logged with
+    the ``mysql_executor`` logger.
+
+    The watchdog must be started from the thread running the loop:
+    >>> watchdog = LoopWatchdog(loop, lag_threshold=0.05)
+    >>> watchdog.start()
+    >>> ...
+    >>> watchdog.stop()
+
+    A started watchdog is registered for its loop, which keeps both the
+    watchdog and the loop referenced until :meth:`stop`, so stop it before
+    the loop is closed.
+
+    :param loop: event loop, if not passed then default will be used
+    :param float interval: seconds between heartbeats
+    :param float lag_threshold: loop lag in seconds reported as a stall
+    :param float queue_threshold: executor queue wait in seconds reported
+        as saturation
+    """
+    def __init__(self, loop=None, *, interval=0.1, lag_threshold=0.1,
+                 queue_threshold=0.5):
+        self._loop = loop or asyncio.get_event_loop()
+        self._interval = interval
+        self._lag_threshold = lag_threshold
+        self._queue_threshold = queue_threshold
+
+        self._handle = None
+        self._expected = None
+        self._loop_thread = None
+        self._sampler = None
+        self._stopped = threading.Event()
+        self._sampled = False
+
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.max_queue_wait = 0.0
+        self.saturations = 0
+
+    @property
+    def running(self):
+        """Whether the watchdog is started
+
+        :rtype: bool
+        """
+        return self._handle is not None
+
+    def start(self):
+        """Starts the heartbeat and the sampler thread"""
+        if self.running:
+            return
+        if self._loop in _watchdogs:
+            raise RuntimeError('Watchdog is already started for the loop')
+        _watchdogs[self._loop] = self
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._schedule()
+
+        self._sampler = threading.Thread(target=self._sample,
+                                         name='mysql_executor-watchdog',
+                                         daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Stops the watchdog"""
+        if not self.running:
+            return
+        _watchdogs.pop(self._loop, None)
+        self._handle.cancel()
+        self._handle = None
+        self._stopped.set()
+        self._sampler.join()
+        self._sampler = None
+
+    def _schedule(self):
+        self._expected = monotonic() + self._interval
+        self._sampled = False
+        self._handle = self._loop.call_later(self._interval, self._beat)
+
+    def _beat(self):
+        lag = monotonic() - self._expected
+        self.max_lag = max(self.max_lag, lag)
+        if lag > self._lag_threshold:
+            self.stalls += 1
+            log.warning('Event loop was blocked for %.3fs', lag)
+        self._schedule()
+
+    def _sample(self):
+        period = min(self._interval, self._lag_threshold) / 2
+        while not self._stopped.wait(period):
+            expected = self._expected
+            if self._sampled or expected is None:
+                continue
+            lag = monotonic() - expected
+            if lag <= self._lag_threshold:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._sampled = True
+            log.warning(
+                'Event loop is blocked for %.3fs, stack sample:\n%s',
+                lag, ''.join(traceback.format_stack(frame))
+            )
+
+    def _timed(self, call, executor):
+        queued = monotonic()
+
+        def timed_call():
+            wait = monotonic() - queued
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+            if wait > self._queue_threshold:
+                self.saturations += 1
+                log.warning('%s waited %.3fs in the queue of executor %r',
+                            getattr(call.func, '__qualname__', call.func),
+                            wait, executor)
+            return call()
+        return timed_call
@@ -0,0 +1,427 @@
+"""
+.. module:: fake_server
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+
+Deterministic stand-in of a MySQL server for offline tests and benchmarks.
+
+The server speaks enough of the client/server protocol for
+mysql-connector-python: the handshake (any user and password are accepted),
+``COM_QUERY`` with scripted result sets, errors and latencies, ``COM_PING``,
+``COM_INIT_DB``, ``COM_RESET_CONNECTION``, ``COM_QUIT`` and the compressed
+protocol. It runs an
+asyncio server on its own event loop in a background thread, so blocking
+clients in executor threads and the client event loop do not compete with
+it. Example:
+
+    >>> server = FakeMySQLServer()
+    >>> server.add_result(r'SELECT id, name FROM users',
+    ...                   [('id', FieldType.LONGLONG), 'name'],
+    ...                   [(1, 'Jane'), (2, 'Joe')], latency=0.001)
+    >>> with server:
+    ...     pool = AsyncConnectionPool(**server.config)
+"""
+
+import asyncio
+import datetime
+import re
+import struct
+import threading
+import zlib
+from collections import Counter
+
+from mysql.connector.constants import FieldType
+
+__all__ = ['FakeMySQLServer']
+
+SERVER_VERSION = '5.7.30-fake'
+
+CAPABILITIES = (
+    0x00000001 |  # LONG_PASSWD
+    0x00000002 |  # FOUND_ROWS
+    0x00000004 |  # LONG_FLAG
+    0x00000008 |  # CONNECT_WITH_DB
+    0x00000020 |  # COMPRESS
+    0x00000200 |  # PROTOCOL_41
+    0x00002000 |  # TRANSACTIONS
+    0x00008000 |  # SECURE_CONNECTION
+    0x00010000 |  # MULTI_STATEMENTS
+    0x00020000 |  # MULTI_RESULTS
+    0x00080000    # PLUGIN_AUTH
+)
+
+STATUS_IN_TRANS = 0x0001
+STATUS_AUTOCOMMIT = 0x0002
+
+COM_QUIT = 0x01
+COM_INIT_DB = 0x02
+COM_QUERY = 0x03
+COM_PING = 0x0e
+COM_RESET_CONNECTION = 0x1f
+
+MAX_PAYLOAD = 0xffffff
+# mysql.connector expects compressed packets of whole packets of at most
+# this size, like net_buffer_length of the server
+COMPRESS_CHUNK = 16384
+
+_BEGIN = re.compile(r'^\s*(START\s+TRANSACTION|BEGIN)\b', re.I)
+_END = re.compile(r'^\s*(COMMIT|ROLLBACK)\s*$', re.I)
+_SELECT_LITERAL = re.compile(r'^\s*SELECT\s+(-?\d+)\s*$', re.I)
+_SELECT = re.compile(r'^\s*SELECT\s+(.*?)\s*$', re.I | re.S)
+
+
+def _lenenc_int(value):
+    if value < 251:
+        return struct.pack('<B', value)
+    if value < 1 << 16:
+        return b'\xfc' + struct.pack('<H', value)
+    if value < 1 << 24:
+        return b'\xfd' + struct.pack('<I', value)[:3]
+    return b'\xfe' + struct.pack('<Q', value)
+
+
+def _lenenc_str(value):
+    return _lenenc_int(len(value)) + value
+
+
+def _text(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(' ').encode()
+    return str(value).encode('utf-8')
+
+
+def _column(name, field_type):
+    charset = 33 if field_type in (FieldType.VAR_STRING, FieldType.STRING,
+                                   FieldType.BLOB) else 63
+    return (
+        _lenenc_str(b'def') + _lenenc_str(b'fake') + _lenenc_str(b't') +
+        _lenenc_str(b't') + _lenenc_str(name.encode('utf-8')) +
+        _lenenc_str(name.encode('utf-8')) +
+        struct.pack('<BHIBHBxx', 0x0c, charset, 255, field_type, 0, 0)
+    )
+
+
+class _Script:
+    def __init__(self, pattern, columns=None, rows=None, error=None,
+                 latency=0.0):
+        self.pattern = re.compile(pattern, re.I | re.S)
+        self.columns = [
+            (c, FieldType.VAR_STRING) if isinstance(c, str) else tuple(c)
+            for c in columns or ()
+        ]
+        self.rows = rows
+        self.error = error
+        self.latency = latency
+
+
+class FakeMySQLServer:
+    """In-process MySQL protocol stand-in.
+
+    Queries are answered by the first script added with
+    :meth:`add_result` or :meth:`add_error` whose pattern matches the
+    whole query. Unmatched ``SELECT <integer>`` returns the integer, other
+    unmatched ``SELECT`` statements return a single ``NULL`` and any other
+    statement gets an OK packet. ``START TRANSACTION``/``COMMIT``/
+    ``ROLLBACK`` maintain the in-transaction status flag.
+
+    :param float latency: seconds added before every response
+    :param str host: interface to listen on
+    :param int port: port to listen on, a free one by default
+    """
+    def __init__(self, *, latency=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self._scripts = []
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._sessions = set()
+        self._next_id = 0
+        #: numbers of received commands, queries and connections
+        self.stats = Counter()
+
+    @property
+    def config(self):
+        """Connection arguments of mysql.connector for this server
+
+        :rtype: dict
+        """
+        return {'host': self.host, 'port': self.port, 'user': 'fake',
+                'password': 'fake', 'database': 'fake'}
+
+    def add_result(self, pattern, columns, rows, *, latency=0.0):
+        """Answers queries matching `pattern` with a result set
+
+        :param str pattern: regular expression matching the whole query
+        :param columns: column names or ``(name, FieldType)`` pairs, names
+            alone are strings
+        :param rows: list of tuples or a callable returning an iterable
+            of tuples, for large generated results
+        :param float latency: seconds added before the result
+        """
+        self._scripts.append(_Script(pattern, columns, rows,
+                                     latency=latency))
+
+    def add_error(self, pattern, errno, message, *, sqlstate='HY000',
+                  latency=0.0):
+        """Answers queries matching `pattern` with an error packet"""
+        self._scripts.append(_Script(pattern, error=(errno, sqlstate,
+                                                     message),
+                                     latency=latency))
+
+    def start(self):
+        """Starts listening in a background thread"""
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._server = self._loop.run_until_complete(
+                    asyncio.start_server(self._accept, self.host, self.port,
+                                         loop=self._loop)
+                )
+                self.port = self._server.sockets[0].getsockname()[1]
+            finally:
+                started.set()
+            self._loop.run_forever()
+
+            for task in self._sessions:
+                task.cancel()
+            if self._sessions:
+                self._loop.run_until_complete(
+                    asyncio.wait(self._sessions, loop=self._loop)
+                )
+
+        self._thread = threading.Thread(target=run, name='fake-mysql',
+                                        daemon=True)
+        self._thread.start()
+        started.wait()
+        if self._server is None:
+            self._thread.join()
+            raise RuntimeError('Fake MySQL server has not started')
+
+    def stop(self):
+        """Stops the server and its thread"""
+        def close():
+            self._server.close()
+            self._loop.stop()
+
+        self._loop.call_soon_threadsafe(close)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _accept(self, reader, writer):
+        task = self._loop.create_task(self._serve(reader, writer))
+        self._sessions.add(task)
+        task.add_done_callback(self._sessions.discard)
+
+    @asyncio.coroutine
+    def _serve(self, reader, writer):
+        self._next_id += 1
+        self.stats['connections'] += 1
+        session = _Session(self, self._next_id, reader, writer)
+        try:
+            yield from session.run()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _script_for(self, query):
+        for script in self._scripts:
+            if script.pattern.fullmatch(query):
+                return script
+        return None
+
+
+class _Session:
+    def __init__(self, server, connection_id, reader, writer):
+        self._server = server
+        self._id = connection_id
+        self._reader = reader
+        self._writer = writer
+        self._seq = 0
+        self._status = STATUS_AUTOCOMMIT
+        self._compressed = False
+        self._compressed_seq = 0
+        self._received = bytearray()
+        self._pending = []
+
+    @asyncio.coroutine
+    def _read(self, size):
+        if not self._compressed:
+            return (yield from self._reader.readexactly(size))
+
+        while len(self._received) < size:
+            header = yield from self._reader.readexactly(7)
+            length = struct.unpack('<I', header[:3] + b'\x00')[0]
+            self._compressed_seq = (header[3] + 1) % 256
+            payload = yield from self._reader.readexactly(length)
+            if header[4:7] != b'\x00\x00\x00':
+                payload = zlib.decompress(payload)
+            self._received += payload
+        data = bytes(self._received[:size])
+        del self._received[:size]
+        return data
+
+    @asyncio.coroutine
+    def _read_packet(self):
+        header = yield from self._read(4)
+        length = header[0] | header[1] << 8 | header[2] << 16
+        self._seq = (header[3] + 1) % 256
+        payload = yield from self._read(length)
+        while length == MAX_PAYLOAD:
+            header = yield from self._read(4)
+            length = header[0] | header[1] << 8 | header[2] << 16
+            self._seq = (header[3] + 1) % 256
+            payload += yield from self._read(length)
+        return payload
+
+    def _write_packet(self, payload):
+        while True:
+            chunk, payload = payload[:MAX_PAYLOAD], payload[MAX_PAYLOAD:]
+            packet = (struct.pack('<I', len(chunk))[:3] +
+                      bytes((self._seq,)) + chunk)
+            if self._compressed:
+                self._pending.append(packet)
+            else:
+                self._writer.write(packet)
+            self._seq = (self._seq + 1) % 256
+            if len(chunk) < MAX_PAYLOAD:
+                break
+
+    def _write_compressed(self, data):
+        payload = zlib.compress(data)
+        if len(payload) < len(data):
+            length = struct.pack('<I', len(data))[:3]
+        else:
+            payload, length = data, b'\x00\x00\x00'
+        self._writer.write(struct.pack('<I', len(payload))[:3] +
+                           bytes((self._compressed_seq,)) + length + payload)
+        self._compressed_seq = (self._compressed_seq + 1) % 256
+
+    @asyncio.coroutine
+    def _flush(self):
+        chunk = b''
+        for packet in self._pending:
+            if chunk and len(chunk) + len(packet) > COMPRESS_CHUNK:
+                self._write_compressed(chunk)
+                chunk = b''
+            chunk += packet
+        if chunk:
+            self._write_compressed(chunk)
+        self._pending = []
+        yield from self._writer.drain()
+
+    def _ok(self, affected_rows=0):
+        self._write_packet(b'\x00' + _lenenc_int(affected_rows) +
+                           _lenenc_int(0) +
+                           struct.pack('<HH', self._status, 0))
+
+    def _eof(self):
+        self._write_packet(b'\xfe' + struct.pack('<HH', 0, self._status))
+
+    def _error(self, errno, sqlstate, message):
+        self._write_packet(b'\xff' + struct.pack('<H', errno) + b'#' +
+                           sqlstate.encode('ascii') +
+                           message.encode('utf-8'))
+
+    @asyncio.coroutine
+    def _result(self, columns, rows):
+        self._write_packet(_lenenc_int(len(columns)))
+        for name, field_type in columns:
+            self._write_packet(_column(name, field_type))
+        self._eof()
+        for i, row in enumerate(rows, start=1):
+            self._write_packet(b''.join(
+                b'\xfb' if value is None else _lenenc_str(_text(value))
+                for value in row
+            ))
+            if not i % 1000:
+                yield from self._flush()
+        self._eof()
+
+    @asyncio.coroutine
+    def run(self):
+        server = self._server
+        self._write_packet(
+            b'\x0a' + SERVER_VERSION.encode() + b'\x00' +
+            struct.pack('<I', self._id) + b'abcdefgh' + b'\x00' +
+            struct.pack('<HBHHB', CAPABILITIES & 0xffff, 33, self._status,
+                        CAPABILITIES >> 16, 21) +
+            b'\x00' * 10 + b'ijklmnopqrst\x00' +
+            b'mysql_native_password\x00'
+        )
+        yield from self._writer.drain()
+
+        # handshake response, credentials are trusted
+        response = yield from self._read_packet()
+        self._ok()
+        yield from self._writer.drain()
+        self._compressed = bool(
+            struct.unpack('<I', response[:4])[0] & 0x00000020
+        )
+
+        while True:
+            packet = yield from self._read_packet()
+            command = packet[0]
+            server.stats['commands'] += 1
+            if server.latency:
+                yield from asyncio.sleep(server.latency)
+
+            if command == COM_QUIT:
+                return
+            elif command == COM_QUERY:
+                yield from self._query(packet[1:].decode('utf-8'))
+            elif command == COM_RESET_CONNECTION:
+                self._status = STATUS_AUTOCOMMIT
+                self._ok()
+            elif command in (COM_PING, COM_INIT_DB):
+                self._ok()
+            else:
+                self._error(1047, '08S01', 'Unknown command')
+            yield from self._flush()
+
+    @asyncio.coroutine
+    def _query(self, query):
+        server = self._server
+        server.stats['queries'] += 1
+
+        script = server._script_for(query)
+        if script is not None:
+            if script.latency:
+                yield from asyncio.sleep(script.latency)
+            if script.error:
+                self._error(*script.error)
+                return
+            rows = script.rows() if callable(script.rows) else script.rows
+            yield from self._result(script.columns, rows)
+            return
+
+        if _BEGIN.match(query):
+            self._status |= STATUS_IN_TRANS
+            self._ok()
+        elif _END.match(query):
+            self._status &= ~STATUS_IN_TRANS
+            self._ok()
+        elif _SELECT_LITERAL.match(query):
+            value = _SELECT_LITERAL.match(query).group(1)
+            yield from self._result([(value, FieldType.LONGLONG)],
+                                    [(value,)])
+        elif _SELECT.match(query):
+            name = _SELECT.match(query).group(1)[:64]
+            yield from self._result([(name, FieldType.VAR_STRING)],
+                                    [(None,)])
+        else:
+            self._ok()
@@ -0,0 +1,49 @@
+"""
+.. module:: test_conversion
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+from operator import methodcaller
+
+from mysql.connector.constants import FieldFlag, FieldType
+from mysql.connector.conversion import MySQLConverter
+
+from mysql_executor.conversion import column_decoders, decode_rows
+
+DESCRIPTION = [
+    ('id', FieldType.LONGLONG, None, None, None, None, 0, 0),
+    ('amount', FieldType.NEWDECIMAL, None, None, None, None, 1, 0),
+    ('created', FieldType.DATETIME, None, None, None, None, 1, 0),
+    ('name', FieldType.VAR_STRING, None, None, None, None, 1, 0),
+    ('data', FieldType.BLOB, None, None, None, None, 1, FieldFlag.BINARY),
+    ('tags', FieldType.STRING, None, None, None, None, 1, FieldFlag.SET),
+]
+
+ROWS = [
+    (b'1', b'10.50', b'2015-01-02 03:04:05.123456', b'Jane', b'\x00\x01',
+     b'a,b'),
+    (b'2', None, None, None, None, None),
+]
+
+
+class TestConversion(unittest.TestCase):
+    def test_decode_rows(self):
+        converter = MySQLConverter('utf8', True)
+        self.assertEqual(
+            decode_rows(ROWS, DESCRIPTION),
+            [converter.row_to_python(row, DESCRIPTION) for row in ROWS]
+        )
+        self.assertEqual(decode_rows([], DESCRIPTION), [])
+
+    def test_converters(self):
+        rows = decode_rows(ROWS, DESCRIPTION,
+                           converters={'amount': methodcaller('decode'),
+                                       0: None})
+        self.assertEqual(rows[0][:2], (b'1', '10.50'))
+        self.assertEqual(rows[1][:2], (b'2', None))
+
+    def test_column_decoders(self):
+        decoders = column_decoders(DESCRIPTION, use_unicode=False)
+        self.assertEqual(decoders[0], (int, False))
+        self.assertEqual(decoders[3], (None, True))
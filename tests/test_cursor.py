@@ -5,6 +5,8 @@
 
 import unittest
 import asyncio
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from time import time
 
 from tests import AsyncioTestConnectable
 
@@ -90,3 +92,56 @@ class TestAsyncCursor(unittest.TestCase, AsyncioTestConnectable):
 
         for row_ind, row in enumerate(rows, start=1):
             self.assertEqual(row[0], row_ind)
+
+    def test_async_decode_executor(self):
+        @asyncio.coroutine
+        def test():
+            cursor = yield from self.cnx.async_cursor(
+                decode_executor=executor, decode_chunk_size=1
+            )
+            yield from cursor.execute('SELECT 1 AS first, \'a\' AS second '
+                                      'UNION '
+                                      'SELECT 2 AS first, \'b\' AS second ')
+            rows = yield from cursor.fetchall()
+            self.assertEqual(rows, [(1, 'a'), (2, 'b')])
+
+        executor = ProcessPoolExecutor(max_workers=2)
+        try:
+            self.loop.run_until_complete(test())
+        finally:
+            executor.shutdown()
+
+    def test_async_aclose(self):
+        @asyncio.coroutine
+        def test():
+            cursor = yield from self.cnx.async_cursor()
+            yield from cursor.execute('SELECT 1 UNION SELECT 2')
+            self.assertTrue(self.cnx.unread_result)
+
+            yield from cursor.aclose()
+            self.assertFalse(self.cnx.unread_result)
+
+        self.loop.run_until_complete(test())
+
+    def test_async_execute_timeout(self):
+        @asyncio.coroutine
+        def test(operation):
+            cursor = yield from self.cnx.async_cursor()
+
+            start = time()
+            with self.assertRaises(TimeoutError):
+                yield from cursor.execute(operation, timeout=0.5)
+            self.assertLess(time() - start, 2)
+            self.assertTrue(self.cnx._needs_reset)
+
+            yield from self.cnx.reset_connection()
+            self.assertFalse(self.cnx._needs_reset)
+
+            cursor = yield from self.cnx.async_cursor()
+            yield from cursor.execute('SELECT 1', timeout=0.5)
+            self.assertEqual((yield from cursor.fetchone()), (1,))
+
+        # SELECT additionally gets the MAX_EXECUTION_TIME hint
+        for operation in ('SELECT SLEEP(5)', 'DO SLEEP(5)'):
+            with self.subTest(operation=operation):
+                self.loop.run_until_complete(test(operation))
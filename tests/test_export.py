@@ -0,0 +1,57 @@
+"""
+.. module:: test_export
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+import asyncio
+import io
+import json
+
+from tests import asyncio_test
+from tests.config import MYSQL_CONFIG
+from mysql_executor import *
+from mysql_executor.async_export import TableExporter
+
+
+class TestTableExporter(unittest.TestCase):
+    @asyncio_test
+    def test_export(self, loop=None):
+        pool = AsyncConnectionPool(size=3, loop=loop, **MYSQL_CONFIG)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('DROP TABLE IF EXISTS testexport')
+            yield from cursor.execute('CREATE TABLE testexport '
+                                      '(id INT PRIMARY KEY, name TEXT)')
+            yield from cursor.executemany(
+                'INSERT INTO testexport (id, name) VALUES (%s, %s)',
+                [(i, 'name%d' % i) for i in range(100)])
+            yield from cnx.commit()
+
+        try:
+            exporter = TableExporter(pool, 'testexport', 'id', batch_size=7)
+            self.assertEqual(len((yield from exporter.partition_bounds())), 2)
+
+            out = io.StringIO()
+            count = yield from exporter.export(out)
+            self.assertEqual(count, 100)
+            lines = out.getvalue().splitlines()
+            self.assertEqual(lines[0], 'id,name')
+            self.assertEqual(sorted(lines[1:],
+                                    key=lambda l: int(l.split(',')[0])),
+                             ['%d,name%d' % (i, i) for i in range(100)])
+
+            exporter = TableExporter(pool, 'testexport', 'id', fmt='jsonl',
+                                     where='id < %s', params=(10,))
+            out = io.StringIO()
+            count = yield from exporter.export(out)
+            self.assertEqual(count, 10)
+            rows = [json.loads(l) for l in out.getvalue().splitlines()]
+            self.assertEqual(sorted(r['id'] for r in rows), list(range(10)))
+        finally:
+            with (yield from pool) as cnx:
+                cursor = yield from cnx.async_cursor()
+                yield from cursor.execute('DROP TABLE testexport')
+
+        yield from pool.shutdown()
@@ -0,0 +1,355 @@
+"""
+.. module:: test_fake_server
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from mysql.connector import errors
+from mysql.connector.constants import FieldType
+
+from tests import asyncio_test
+from tests.fake_server import FakeMySQLServer
+from mysql_executor import *
+from mysql_executor.async_export import TableExporter
+from mysql_executor.statements import StatementStats
+
+
+class TestFakeServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeMySQLServer()
+        self.server.add_result(r'SELECT id, name FROM users',
+                               [('id', FieldType.LONGLONG), 'name'],
+                               [(1, 'Jane'), (2, None)])
+        self.server.add_result(r'SELECT id FROM big',
+                               [('id', FieldType.LONGLONG)],
+                               lambda: ((i,) for i in range(10000)))
+        self.server.add_error(r'UPDATE .*', 1213, 'Deadlock found')
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    @asyncio_test
+    def test_queries(self, loop=None):
+        pool = AsyncConnectionPool(size=2, loop=loop, **self.server.config)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('SELECT id, name FROM users')
+            self.assertEqual(cursor.column_names, ('id', 'name'))
+            self.assertEqual((yield from cursor.fetchall()),
+                             [(1, 'Jane'), (2, None)])
+
+            yield from cursor.execute('SELECT 5')
+            self.assertEqual((yield from cursor.fetchone()), (5,))
+            self.assertIsNone((yield from cursor.fetchone()))
+
+            yield from cursor.execute('SELECT id FROM big')
+            rows = yield from cursor.fetchmany(100)
+            self.assertEqual(rows[-1], (99,))
+            rows = yield from cursor.fetchall()
+            self.assertEqual(len(rows), 9900)
+
+            with self.assertRaises(errors.DatabaseError) as ctx:
+                yield from cursor.execute('UPDATE t SET a = 1')
+            self.assertEqual(ctx.exception.errno, 1213)
+
+            yield from cnx.start_transaction()
+            self.assertTrue(cnx.in_transaction)
+            yield from cnx.rollback()
+            self.assertFalse(cnx.in_transaction)
+
+        yield from pool.shutdown()
+        self.assertEqual(self.server.stats['connections'], 1)
+
+    @asyncio_test
+    def test_execute_timeout(self, loop=None):
+        # the hint outlasts the client timeout by SERVER_TIMEOUT_MARGIN
+        self.server.add_error(r'SELECT /\*\+ MAX_EXECUTION_TIME\(1100\) \*/ '
+                              r'id FROM stopped', 3024,
+                              'Query execution was interrupted')
+        self.server.add_result(r'SELECT .*id FROM slow',
+                               [('id', FieldType.LONGLONG)], [(1,)],
+                               latency=0.5)
+        pool = AsyncConnectionPool(size=1, loop=loop, **self.server.config)
+
+        with (yield from pool) as cnx:
+            for operation in ('SELECT id FROM stopped', 'SELECT id FROM slow'):
+                cursor = yield from cnx.async_cursor()
+                with self.assertRaises(TimeoutError):
+                    yield from cursor.execute(operation, timeout=0.1)
+                self.assertTrue(cnx._needs_reset)
+                yield from cnx.reset_connection()
+
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_transaction_nesting(self, loop=None):
+        pool = AsyncConnectionPool(size=1, loop=loop, **self.server.config)
+        attempts = []
+
+        @asyncio.coroutine
+        def work(cnx):
+            attempts.append(cnx._transaction_depth)
+            tx = cnx.transaction()
+            yield from tx.begin()
+            self.assertTrue(tx.nested)
+            yield from tx.commit()
+            if len(attempts) < 2:
+                raise errors.DatabaseError(msg='Deadlock found', errno=1213)
+
+        with (yield from pool) as cnx:
+            # a transaction left open by an earlier statement is not an
+            # outer transaction: it is committed and deadlocks are retried
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('START TRANSACTION')
+            self.assertTrue(cnx.in_transaction)
+            yield from cnx.run_in_transaction(work, backoff=0)
+            self.assertEqual(attempts, [1, 1])
+            self.assertEqual(cnx._transaction_depth, 0)
+            self.assertFalse(cnx.in_transaction)
+
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_key_overflow_release(self, loop=None):
+        pool = AsyncConnectionPool(size=4, queue_timeout=0.1, key_limit=1,
+                                   overflow=1, loop=loop,
+                                   **self.server.config)
+
+        cnx_a = yield from pool.get('a')
+        cnx_a2 = yield from pool.get('a')  # from the overflow
+        cnx_b = yield from pool.get('b')
+        # the own connection is released first, the overflow one takes
+        # over the quota of the key and the overflow is free again
+        pool.release(cnx_a)
+        cnx_a3 = yield from pool.get('a')
+        self.assertIsNot(cnx_a3, cnx_a2)
+
+        for cnx in (cnx_a2, cnx_a3, cnx_b):
+            pool.release(cnx)
+        # connections closed by shrinking are forgotten by their keys
+        pool.resize(1)
+        self.assertEqual(len(pool), 1)
+        self.assertLessEqual(set(pool._last_used.values()), pool._pool)
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_failed_cleanup(self, loop=None):
+        self.server.add_error(r'ROLLBACK', 2013, 'Lost connection')
+        pool = AsyncConnectionPool(size=1, loop=loop, **self.server.config)
+
+        cnx = yield from pool.get()
+        yield from cnx.start_transaction()
+        waiter = loop.create_task(pool.get())
+        pool.release(cnx)  # the rollback fails, the connection is dropped
+        cnx2 = yield from waiter
+        self.assertIsNot(cnx2, cnx)
+        self.assertTrue((yield from cnx2.is_connected()))
+        self.assertEqual(len(pool), 1)
+
+        pool.release(cnx2)
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_adaptive_size_key_limit(self, loop=None):
+        pool = AsyncConnectionPool(size=2, max_size=10, adapt_interval=0.05,
+                                   queue_timeout=0.3, key_limit=1,
+                                   loop=loop, **self.server.config)
+
+        cnx = yield from pool.get('a')
+        # the waiter is held back by the key limit, not by the pool size
+        with self.assertRaises(TimeoutError):
+            yield from pool.get('a')
+        self.assertEqual(pool.size, 2)
+        self.assertEqual(pool.stats.get('grown', 0), 0)
+
+        pool.release(cnx)
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_export_failure(self, loop=None):
+        self.server.add_result(r'SELECT MIN\(`id`\), MAX\(`id`\) FROM `big`',
+                               [('min', FieldType.LONGLONG),
+                                ('max', FieldType.LONGLONG)], [(0, 9999)])
+        self.server.add_result(r'SELECT \* FROM `big` WHERE `id` < .*',
+                               [('id', FieldType.LONGLONG)],
+                               lambda: ((i,) for i in range(10000)))
+        self.server.add_error(r'SELECT \* FROM `big` WHERE `id` >= .*',
+                              1146, "Table 'big' doesn't exist")
+        pool = AsyncConnectionPool(size=2, loop=loop, **self.server.config)
+        executor = ThreadPoolExecutor(2)
+        exporter = TableExporter(pool, 'big', 'id', fmt='jsonl',
+                                 batch_size=100, executor=executor, loop=loop)
+
+        # the failed range stops the other one, which returns its
+        # connection with the rest of its result discarded
+        with self.assertRaises(errors.DatabaseError):
+            yield from exporter.export(io.StringIO())
+        self.assertEqual(pool.free_count, 2)
+
+        executor.shutdown()
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_converters(self, loop=None):
+        pool = AsyncConnectionPool(size=1, loop=loop, **self.server.config)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor(converters={})
+            yield from cursor.execute('SELECT id, name FROM users')
+            self.assertEqual((yield from cursor.fetchone()), (1, 'Jane'))
+            self.assertEqual((yield from cursor.fetchall()), [(2, None)])
+
+            cursor = yield from cnx.async_cursor(converters={'id': float})
+            yield from cursor.execute('SELECT id FROM big')
+            rows = yield from cursor.fetchmany(2)
+            self.assertEqual(rows, [(0.0,), (1.0,)])
+            yield from cursor.aclose()
+
+            with self.assertRaises(ValueError):
+                yield from cnx.async_cursor(converters={}, dictionary=True)
+
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_spooled_cursor(self, loop=None):
+        pool = AsyncConnectionPool(size=1, loop=loop, **self.server.config)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor(max_buffer_size=1000)
+            yield from cursor.execute('SELECT id FROM big')
+            self.assertEqual(cursor.rowcount, 10000)
+            self.assertGreater(cursor.spilled, 9900)
+            self.assertEqual((yield from cursor.fetchone()), (0,))
+            rows = yield from cursor.fetchmany(3)
+            self.assertEqual(rows, [(1,), (2,), (3,)])
+            cursor.scroll(5000, mode='absolute')
+            self.assertEqual((yield from cursor.fetchone()), (5000,))
+            cursor.scroll(-5001)
+            rows = yield from cursor.fetchall()
+            self.assertEqual(rows, [(i,) for i in range(10000)])
+            self.assertEqual((yield from cursor.fetchmany(10)), [])
+            with self.assertRaises(IndexError):
+                cursor.scroll(1)
+
+            # the connection is free for other statements
+            yield from cursor.execute('SELECT id, name FROM users')
+            self.assertEqual(cursor.spilled, 0)
+            self.assertEqual((yield from cursor.fetchall()),
+                             [(1, 'Jane'), (2, None)])
+            yield from cursor.aclose()
+
+            with self.assertRaises(ValueError):
+                yield from cnx.async_cursor(max_buffer_size=1000, raw=True)
+
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_compress(self, loop=None):
+        pool = AsyncConnectionPool(size=1, loop=loop, compress=True,
+                                   **self.server.config)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('SELECT id FROM big')
+            rows = yield from cursor.fetchall()
+            self.assertEqual(rows[-1], (9999,))
+            self.assertGreater(cnx.traffic['payload_received'],
+                               cnx.traffic['bytes_received'])
+            # no keys are added from the executor thread
+            self.assertEqual(set(cnx.traffic),
+                             set(AsyncMySQLConnection(loop=loop).traffic))
+            received = cnx.traffic['bytes_received']
+
+        self.assertNotIn('checkouts', cnx.traffic)
+        self.assertEqual(pool.stats['bytes_received'], received)
+        self.assertGreater(pool.stats['bytes_saved'], 0)
+        yield from pool.shutdown()
+        # traffic of closed connections is kept
+        self.assertGreaterEqual(pool.stats['bytes_received'], received)
+
+    @asyncio_test
+    def test_connect_limits(self, loop=None):
+        pool = AsyncConnectionPool(size=4, loop=loop, connect_concurrency=2,
+                                   connect_rate=20, dns_ttl=60,
+                                   **dict(self.server.config,
+                                          host='localhost'))
+
+        start = loop.time()
+        connections = yield from asyncio.gather(
+            *[pool.get() for _ in range(4)], loop=loop
+        )
+        self.assertGreaterEqual(loop.time() - start, 0.15)
+        self.assertEqual(pool.stats['connects'], 4)
+        for cnx in connections:
+            # reconnects resolve the name again
+            self.assertEqual(cnx.server_host, 'localhost')
+            self.assertEqual(cnx._connect_config['host'], 'localhost')
+            pool.release(cnx)
+        yield from connections[0].reconnect()
+        self.assertTrue((yield from connections[0].is_connected()))
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_statement_stats(self, loop=None):
+        stats = StatementStats()
+        pool = AsyncConnectionPool(size=1, loop=loop, statement_stats=stats,
+                                   **self.server.config)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            for _ in range(3):
+                yield from cursor.execute('SELECT id, name FROM users')
+                yield from cursor.fetchall()
+            with self.assertRaises(errors.DatabaseError):
+                yield from cursor.execute('UPDATE t SET a = 1')
+
+        rows = {row['fingerprint']: row for row in stats.export()}
+        self.assertEqual(rows['SELECT id, name FROM users']['calls'], 3)
+        self.assertEqual(rows['SELECT id, name FROM users']['rows_returned'],
+                         6)
+        self.assertEqual(rows['UPDATE t SET a = ?']['errors'], 1)
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_write_behind(self, loop=None):
+        pool = AsyncConnectionPool(size=2, loop=loop, **self.server.config)
+        queue = pool.write_behind(batch_size=100, flush_interval=0.01,
+                                  max_pending=200)
+
+        acks = []
+        for i in range(450):
+            acks.append((yield from queue.enqueue(
+                'INSERT INTO t (a) VALUES (%s)', (i,)
+            )))
+            self.assertLessEqual(queue.pending, 200)
+        yield from asyncio.wait_for(acks[-1], 1, loop=loop)  # by the timer
+        yield from asyncio.gather(*acks, loop=loop)
+        self.assertEqual(queue.stats['rows'], 450)
+        self.assertEqual(queue.stats['batches'], 5)
+        # a multi-row INSERT and a COMMIT per batch, besides the character
+        # set and autocommit set up of every connection
+        self.assertEqual(self.server.stats['queries'] -
+                         2 * self.server.stats['connections'], 10)
+
+        yield from queue.close()
+        with self.assertRaises(RuntimeError):
+            yield from queue.enqueue('INSERT INTO t (a) VALUES (%s)', (1,))
+
+        # an enqueue waiting for a slot is refused when the queue closes
+        queue = pool.write_behind(batch_size=1, max_pending=1)
+        yield from queue.enqueue('INSERT INTO t (a) VALUES (%s)', (1,))
+        blocked = loop.create_task(
+            queue.enqueue('INSERT INTO t (a) VALUES (%s)', (2,))
+        )
+        yield from asyncio.sleep(0, loop=loop)
+        yield from queue.close()
+        with self.assertRaises(RuntimeError):
+            yield from blocked
+        self.assertEqual(queue.stats['rows'], 1)
+        self.assertEqual(queue.pending, 0)
+        yield from pool.shutdown()
@@ -0,0 +1,44 @@
+"""
+.. module:: test_import
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import subprocess
+import sys
+import unittest
+
+
+class TestLazyImport(unittest.TestCase):
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     'module __getattr__ requires Python 3.7')
+    def test_lazy_import(self):
+        output = subprocess.check_output([sys.executable, '-c', '''
+import sys
+import mysql_executor
+print('mysql.connector' in sys.modules)
+mysql_executor.AsyncConnectionPool
+print('mysql.connector' in sys.modules,
+      'mysql_executor.async_export' in sys.modules)
+'''])
+        self.assertEqual(output.decode().split(), ['False', 'True', 'False'])
+
+    def test_star_import(self):
+        output = subprocess.check_output([sys.executable, '-c', '''
+import sys
+from mysql_executor import *
+print(AsyncConnectionPool.__name__,
+      'mysql_executor.async_export' in sys.modules,
+      'mysql_executor.async_spooled_cursor' in sys.modules)
+'''])
+        self.assertEqual(output.decode().split(),
+                         ['AsyncConnectionPool', 'False', 'False'])
+
+    def test_names(self):
+        import mysql_executor
+        names = mysql_executor.__all__
+        if sys.version_info >= (3, 7):
+            names = names + sorted(mysql_executor._LAZY)
+        for name in names:
+            self.assertTrue(hasattr(mysql_executor, name), name)
+        with self.assertRaises(AttributeError):
+            mysql_executor.Missing
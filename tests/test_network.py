@@ -0,0 +1,28 @@
+"""
+.. module:: test_network
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+import asyncio
+
+from tests import asyncio_test
+from mysql_executor.network import DNSCache
+
+
+class TestDNSCache(unittest.TestCase):
+    @asyncio_test
+    def test_resolve(self, loop=None):
+        cache = DNSCache(60, loop=loop)
+        addresses = yield from asyncio.gather(
+            cache.resolve('localhost', 3306), cache.resolve('localhost', 3306),
+            loop=loop
+        )
+        self.assertIn(addresses[0], ('127.0.0.1', '::1'))
+        self.assertEqual(addresses[0], addresses[1])
+        self.assertEqual(len(cache._entries), 1)
+        self.assertEqual((yield from cache.resolve('10.0.0.1', 3306)),
+                         '10.0.0.1')
+
+        cache.clear()
+        self.assertEqual(len(cache._entries), 0)
@@ -6,6 +6,7 @@
 import unittest
 import asyncio
 from time import time
+from concurrent.futures import TimeoutError
 
 from tests import asyncio_test
 from tests.config import MYSQL_CONFIG
@@ -71,3 +72,101 @@ class TestAsyncPool(unittest.TestCase):
             self.assertEqual(row.second, 2)
 
         yield from pool.shutdown()
+
+    @asyncio_test
+    def test_release_unread_result(self, loop=None):
+        pool = AsyncConnectionPool(loop=loop, **MYSQL_CONFIG)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('SELECT 1 UNION SELECT 2')
+
+        # the result is discarded in the background
+        cnx2 = yield from pool.get()
+        self.assertIs(cnx, cnx2)
+        self.assertFalse(cnx2.unread_result)
+
+        cursor = yield from cnx2.async_cursor()
+        yield from cursor.execute('SELECT 3')
+        self.assertEqual((yield from cursor.fetchone()), (3,))
+        pool.release(cnx2)
+
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_release_reset(self, loop=None):
+        pool = AsyncConnectionPool(loop=loop, **MYSQL_CONFIG)
+
+        with (yield from pool) as cnx:
+            yield from cnx.start_transaction()
+
+        # the transaction is rolled back in the background
+        with (yield from pool) as cnx:
+            self.assertFalse(cnx.in_transaction)
+
+        yield from pool.shutdown()
+
+        pool = AsyncConnectionPool(reset_session=True, loop=loop,
+                                   **MYSQL_CONFIG)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('SET @testreset = 1')
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('SELECT @testreset')
+            self.assertEqual((yield from cursor.fetchone()), (None,))
+
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_key_limits(self, loop=None):
+        pool = AsyncConnectionPool(size=3, queue_timeout=0.1, key_limit=1,
+                                   overflow=1, sticky=True, loop=loop,
+                                   **MYSQL_CONFIG)
+
+        cnx_a = yield from pool.get('a')
+        cnx_a2 = yield from pool.get('a')  # from the overflow
+        with self.assertRaises(TimeoutError):
+            yield from pool.get('a')
+
+        # another key is not starved
+        cnx_b = yield from pool.get('b')
+        self.assertEqual(pool.free_count, 0)
+
+        pool.release(cnx_a2)
+        pool.release(cnx_b)
+
+        # sticky: the connection last used by the key
+        cnx_b2 = yield from pool.get('b')
+        self.assertIs(cnx_b, cnx_b2)
+
+        pool.release(cnx_a)
+        pool.release(cnx_b2)
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_adaptive_size(self, loop=None):
+        pool = AsyncConnectionPool(size=1, max_size=3, adapt_interval=0.1,
+                                   idle_timeout=0.2, loop=loop,
+                                   **MYSQL_CONFIG)
+
+        cnx = yield from pool.get()
+        # the waiter makes the pool grow instead of timing out
+        cnx2 = yield from pool.get()
+        self.assertIsNot(cnx, cnx2)
+        self.assertEqual(pool.size, 2)
+        self.assertEqual(pool.stats['grown'], 1)
+
+        pool.release(cnx)
+        pool.release(cnx2)
+
+        yield from asyncio.sleep(0.5, loop=loop)
+        self.assertEqual(pool.size, 1)
+        self.assertEqual(len(pool), 1)
+
+        pool.resize(3)
+        self.assertEqual(pool.size, 3)
+
+        yield from pool.shutdown()
@@ -0,0 +1,53 @@
+"""
+.. module:: test_scan
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+import asyncio
+
+from tests import asyncio_test
+from tests.config import MYSQL_CONFIG
+from mysql_executor import *
+
+
+class TestKeysetScan(unittest.TestCase):
+    @asyncio_test
+    def test_scan_pages(self, loop=None):
+        pool = AsyncConnectionPool(size=2, loop=loop, **MYSQL_CONFIG)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('DROP TABLE IF EXISTS testscan')
+            yield from cursor.execute('CREATE TABLE testscan '
+                                      '(a INT, b INT, PRIMARY KEY (a, b))')
+            yield from cursor.executemany(
+                'INSERT INTO testscan (a, b) VALUES (%s, %s)',
+                [(a, b) for a in range(5) for b in range(3)])
+            yield from cnx.commit()
+
+        try:
+            scan = pool.scan('testscan', ('a', 'b'), batch_size=4,
+                             prefetch=True)
+            rows = []
+            while True:
+                page = yield from scan.fetch_page()
+                if not page:
+                    break
+                self.assertLessEqual(len(page), 4)
+                rows.extend(page)
+            self.assertEqual(rows, sorted(rows))
+            self.assertEqual(len(rows), 15)
+            self.assertEqual(scan.last_key, (4, 2))
+
+            # resuming from a saved key
+            scan = pool.scan('testscan', ('a', 'b'), where='b <> %s',
+                             params=(0,), start_after=(3, 1))
+            rows = yield from scan.fetch_page()
+            self.assertEqual(rows, [(3, 2), (4, 1), (4, 2)])
+        finally:
+            with (yield from pool) as cnx:
+                cursor = yield from cnx.async_cursor()
+                yield from cursor.execute('DROP TABLE testscan')
+
+        yield from pool.shutdown()
@@ -0,0 +1,34 @@
+"""
+.. module:: test_spool
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+
+from mysql_executor.spool import RowSpool
+
+
+class TestRowSpool(unittest.TestCase):
+    def test_memory(self):
+        spool = RowSpool(1 << 20)
+        spool.extend([(b'1', b'a'), (b'2', None)])
+        spool.seal()
+        self.assertEqual(len(spool), 2)
+        self.assertEqual(spool.spilled, 0)
+        self.assertEqual(spool.rows(1, 5), [(b'2', None)])
+        spool.close()
+
+    def test_spill(self):
+        rows = [(str(i).encode(), None if i % 3 else b'x' * (i * 7))
+                for i in range(2000)]
+        rows.append((b'long', b'y' * 70000))
+        spool = RowSpool(1000)
+        spool.extend(rows)
+        spool.seal()
+        self.assertEqual(len(spool), len(rows))
+        self.assertGreater(spool.spilled, 1900)
+        self.assertEqual(spool.rows(0, len(rows)), rows)
+        self.assertEqual(spool.rows(1500, 1502), rows[1500:1502])
+        self.assertEqual(spool.rows(len(rows), len(rows) + 1), [])
+        spool.close()
+        self.assertEqual(len(spool), 0)
@@ -0,0 +1,47 @@
+"""
+.. module:: test_statements
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+
+from mysql_executor.statements import StatementStats, fingerprint
+
+
+class TestStatementStats(unittest.TestCase):
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t1 /* hint */ WHERE id IN (1, 2, 3) "
+                        "AND name = 'it''s'  AND x > -1.5e3"),
+            'SELECT * FROM t1 WHERE id IN (...) AND name = ? AND x > ?'
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (...)'
+        )
+        self.assertEqual(fingerprint('SELECT %(id)s, 0x1F'), 'SELECT ?, ?')
+
+    def test_record(self):
+        stats = StatementStats(max_statements=2)
+        for i in range(100):
+            stats.record('SELECT %d' % i, 0.001 * (i + 1))
+        entry = stats.record('UPDATE t SET a = 1', 0.5, rows_affected=3)
+        entry.rows_returned += 7
+        stats.record('DELETE FROM t', 0.1, error=True)
+
+        rows = {row['fingerprint']: row for row in stats.export()}
+        self.assertEqual(len(rows), 3)  # the last one is not kept alone
+
+        select = rows['SELECT ?']
+        self.assertEqual(select['calls'], 100)
+        self.assertAlmostEqual(select['p50'], 0.05, delta=0.05 * 0.1)
+        self.assertAlmostEqual(select['p99'], 0.099, delta=0.099 * 0.1)
+        self.assertEqual(select['max_time'], 0.1)
+
+        update = rows['UPDATE t SET a = ?']
+        self.assertEqual(update['rows_affected'], 3)
+        self.assertEqual(update['rows_returned'], 7)
+        self.assertEqual(rows[None]['errors'], 1)
+
+        stats.reset()
+        self.assertEqual(stats.export(), [])
@@ -0,0 +1,82 @@
+"""
+.. module:: test_transaction
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+import asyncio
+from mysql.connector import errors
+
+from tests import asyncio_test
+from tests.config import MYSQL_CONFIG
+from mysql_executor import *
+
+
+class TestTransaction(unittest.TestCase):
+    @asyncio_test
+    def test_run_in_transaction(self, loop=None):
+        pool = AsyncConnectionPool(loop=loop, **MYSQL_CONFIG)
+        attempts = []
+
+        @asyncio.coroutine
+        def work(cnx, value):
+            self.assertTrue(cnx.in_transaction)
+            attempts.append(value)
+            if len(attempts) < 3:
+                raise errors.DatabaseError(msg='Deadlock found', errno=1213)
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('SELECT %s', (value,))
+            return (yield from cursor.fetchone())[0]
+
+        result = yield from pool.run_in_transaction(work, 5, backoff=0.01)
+        self.assertEqual(result, 5)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(pool.stats['transaction_retries'], 2)
+
+        @asyncio.coroutine
+        def fail(cnx):
+            raise errors.DatabaseError(msg='Lock wait timeout', errno=1205)
+
+        with self.assertRaises(errors.DatabaseError):
+            yield from pool.run_in_transaction(fail, retries=1, backoff=0)
+        self.assertEqual(pool.stats['transaction_retries'], 3)
+        self.assertEqual(pool.stats['transaction_failures'], 1)
+
+        with (yield from pool) as cnx:
+            self.assertFalse(cnx.in_transaction)
+
+        yield from pool.shutdown()
+
+    @asyncio_test
+    def test_nested_transaction(self, loop=None):
+        pool = AsyncConnectionPool(loop=loop, **MYSQL_CONFIG)
+
+        @asyncio.coroutine
+        def insert(cnx, value, fail=False):
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('INSERT INTO testnested (id) '
+                                      'VALUES (%s)', (value,))
+            if fail:
+                raise ValueError(value)
+
+        @asyncio.coroutine
+        def batch(cnx):
+            yield from insert(cnx, 1)
+            with self.assertRaises(ValueError):
+                yield from cnx.run_in_transaction(insert, 2, True)
+            self.assertTrue(cnx.in_transaction)
+            yield from cnx.run_in_transaction(insert, 3)
+
+        with (yield from pool) as cnx:
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('CREATE TEMPORARY TABLE testnested '
+                                      '(id INT PRIMARY KEY)')
+            yield from cnx.commit()
+
+            yield from cnx.run_in_transaction(batch)
+
+            cursor = yield from cnx.async_cursor()
+            yield from cursor.execute('SELECT id FROM testnested ORDER BY id')
+            self.assertEqual((yield from cursor.fetchall()), [(1,), (3,)])
+
+        yield from pool.shutdown()
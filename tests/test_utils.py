@@ -0,0 +1,39 @@
+"""
+.. module:: test_utils
+.. moduleauthor:: Artem Mustafa <artemmus@yahoo.com>
+"""
+
+import unittest
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tests import asyncio_test
+from mysql_executor.utils import LoopWatchdog, run_in_executor
+
+
+class TestLoopWatchdog(unittest.TestCase):
+    @asyncio_test
+    def test_watchdog(self, loop=None):
+        executor = ThreadPoolExecutor(max_workers=1)
+        watchdog = LoopWatchdog(loop, interval=0.02, lag_threshold=0.05,
+                                queue_threshold=0.05)
+        watchdog.start()
+        self.assertTrue(watchdog.running)
+
+        yield from asyncio.sleep(0.05, loop=loop)
+        time.sleep(0.2)  # blocks the loop
+        yield from asyncio.sleep(0.05, loop=loop)
+        self.assertEqual(watchdog.stalls, 1)
+        self.assertGreaterEqual(watchdog.max_lag, 0.15)
+
+        yield from asyncio.gather(
+            *[run_in_executor(loop, executor, time.sleep, 0.1)
+              for _ in range(2)],
+            loop=loop
+        )
+        self.assertEqual(watchdog.saturations, 1)
+
+        watchdog.stop()
+        self.assertFalse(watchdog.running)
+        executor.shutdown()